@@ -1,18 +1,95 @@
+try:
+    from .bpe_trainer import IncrementalBPETrainer
+    from .bpe_encoder import SPLIT_PATTERN, RankEncoder, merges_from_vocab
+    from .parallel_trainer import ChunkBPETrainer, count_chunks, stream_chunk_counts
+    from .tokenizer_file import read_tokenizer, write_tokenizer
+except ImportError:
+    from bpe_trainer import IncrementalBPETrainer
+    from bpe_encoder import SPLIT_PATTERN, RankEncoder, merges_from_vocab
+    from parallel_trainer import ChunkBPETrainer, count_chunks, stream_chunk_counts
+    from tokenizer_file import read_tokenizer, write_tokenizer
+
+
+def _silent(*args, **kwargs):
+    pass
+
+
 class BPETokenizer:
     def __init__(self, text: str, iterations = 50):
         self.text = text
         self.char_to_idx = {}
         self.idx_to_char = {}
+        self.merges = {}
+        # None: merges may span word boundaries, so encode the text as one chunk
+        self.split_pattern = None
+        self.chunk_counts = None
         self._create_vocab()
         self.iterations = iterations
+        self._encoder = None
+        self._encoder_key = None
+        self._decode_table = None
+
+    @classmethod
+    def from_blocks(cls, blocks, iterations = 50, pattern: str = SPLIT_PATTERN, shard_size: int = None,
+                    processes: int = None) -> "BPETokenizer":
+        """
+        Build a tokenizer from an iterator of text blocks without holding the corpus in memory.
+
+        The blocks are consumed once to build the chunk frequency table, which
+        `bpe_from_counts` then trains on. `self.text` stays empty.
+        """
+        chunk_counts = stream_chunk_counts(blocks, pattern, shard_size, processes)
+
+        tokenizer = cls("", iterations)
+        tokenizer._create_vocab(set().union(*chunk_counts))
+        tokenizer.chunk_counts = chunk_counts
+        tokenizer.split_pattern = None if shard_size else pattern
+        return tokenizer
+
+    @classmethod
+    def from_file(cls, file_path: str, iterations = 50, pattern: str = SPLIT_PATTERN, shard_size: int = None,
+                  processes: int = None, block_size: int = 1 << 20, encoding: str = 'utf-8') -> "BPETokenizer":
+        """Build a tokenizer by streaming a text file in blocks of `block_size` characters."""
+        with open(file_path, 'r', encoding=encoding) as f:
+            blocks = iter(lambda: f.read(block_size), '')
+            return cls.from_blocks(blocks, iterations, pattern, shard_size, processes)
+
+    @classmethod
+    def from_vocab(cls, idx_to_char: dict, merges: dict = None, split_pattern: str = None) -> "BPETokenizer":
+        """Wrap an existing vocabulary, e.g. the pickled GPT_nano mappings; merges are rebuilt if not given."""
+        tokenizer = cls("", iterations=0)
+        tokenizer.idx_to_char = dict(idx_to_char)
+        tokenizer.char_to_idx = {token: idx for idx, token in tokenizer.idx_to_char.items()}
+        tokenizer.merges = merges if merges is not None else merges_from_vocab(tokenizer.idx_to_char, tokenizer.char_to_idx)
+        tokenizer.split_pattern = split_pattern
+        return tokenizer
+
+    def save(self, file_path: str):
+        """Write the vocabulary, merge list and split pattern in the compact binary format of `tokenizer_file`."""
+        write_tokenizer(file_path, self.idx_to_char, self.merges, self.split_pattern)
+
+    @classmethod
+    def load(cls, file_path: str) -> "BPETokenizer":
+        """
+        Load a tokenizer written by `save`.
+
+        The file is memory-mapped: `idx_to_char` reads token bytes straight from
+        it and `char_to_idx` is only built on first lookup. The loaded tokenizer
+        encodes and decodes but cannot be trained further.
+        """
+        tokenizer = cls("", iterations=0)
+        tokenizer.idx_to_char, tokenizer.char_to_idx, tokenizer.merges, tokenizer.split_pattern = read_tokenizer(file_path)
+        return tokenizer
 
-    def _create_vocab(self):
-        for idx, char in enumerate(list(set(self.text))):
+    def _create_vocab(self, chars = None):
+        if chars is None:
+            chars = set(self.text)
+        for idx, char in enumerate(list(chars)):
             unicode_code_point = char.encode('utf-8')
             self.char_to_idx[unicode_code_point] = idx
             self.idx_to_char[idx] = unicode_code_point
 
-    def encode(self, text: str, char_to_idx = None) -> list:
+    def _encode_bytes(self, text: str, char_to_idx = None) -> list:
         byte_text = text.encode('utf-8')
 
         if char_to_idx:
@@ -21,6 +98,32 @@ class BPETokenizer:
             unicode_points = [self.char_to_idx[bytes([b])] for b in byte_text]
         return unicode_points
 
+    def _get_encoder(self, char_to_idx = None) -> RankEncoder:
+        mapping = char_to_idx if char_to_idx else self.char_to_idx
+        key = (id(mapping), len(mapping), len(self.merges), self.split_pattern)
+        if self._encoder is None or self._encoder_key != key:
+            if mapping is self.char_to_idx and self.merges:
+                merges = self.merges
+            else:
+                merges = merges_from_vocab({idx: token for token, idx in mapping.items()}, mapping)
+            self._encoder = RankEncoder(mapping, merges, pattern=self.split_pattern)
+            self._encoder_key = key
+        return self._encoder
+
+    def encode(self, text: str, char_to_idx = None) -> list:
+        """
+        Encode text by applying the learned merges in rank order.
+
+        Args:
+            text: Text to encode
+            char_to_idx: Optional vocabulary to use instead of the tokenizer's own;
+                its merges are reconstructed from the token bytes
+        """
+        return self._get_encoder(char_to_idx).encode(text)
+
+    def encode_batch(self, texts: list, char_to_idx = None) -> list:
+        return self._get_encoder(char_to_idx).encode_batch(texts)
+
     def decode(self, unicode_code_point_list: list, idx_to_char = None) -> str:
 
         if idx_to_char:
@@ -30,6 +133,31 @@ class BPETokenizer:
         
         return byte_seq.decode('utf-8')
 
+    def decode_batch(self, tokens, errors: str = 'replace'):
+        """
+        Vectorized decode of a NumPy array or torch tensor of token ids.
+
+        A 1-D input gives a string, a 2-D (batch, time) input a list of strings.
+        Requires NumPy; the byte table is built once per vocabulary size.
+        """
+        try:
+            from .bpe_decoder import DecodeTable
+        except ImportError:
+            from bpe_decoder import DecodeTable
+
+        if self._decode_table is None or len(self._decode_table) != len(self.idx_to_char):
+            self._decode_table = DecodeTable(self.idx_to_char)
+        return self._decode_table.decode(tokens, errors=errors)
+
+    def incremental_decoder(self, errors: str = 'replace'):
+        """Return a decoder that accepts tokens one at a time and only emits complete UTF-8 text."""
+        try:
+            from .bpe_decoder import IncrementalDecoder
+        except ImportError:
+            from bpe_decoder import IncrementalDecoder
+
+        return IncrementalDecoder(self.idx_to_char, errors=errors)
+
     def _get_stats(self, unicode_code_point_list: list) -> dict:
         stats = {}
         for itm1, itm2 in zip(unicode_code_point_list, unicode_code_point_list[1:]):
@@ -50,44 +178,142 @@ class BPETokenizer:
 
             self.char_to_idx[new_token] = new_token_idx
             self.idx_to_char[new_token_idx] = new_token
+            self.merges[pair_with_max_occurrences] = new_token_idx
 
-            i = 0
-            while i < len(unicode_code_point_list) - 1:
-                if (unicode_code_point_list[i], unicode_code_point_list[i + 1]) == pair_with_max_occurrences:
-                    unicode_code_point_list[i] = new_token_idx
-                    unicode_code_point_list.pop(i + 1)
+            # compact-and-rewrite in place: one linear pass instead of a pop per merge
+            read = write = 0
+            n = len(unicode_code_point_list)
+            while read < n:
+                if read < n - 1 and (unicode_code_point_list[read], unicode_code_point_list[read + 1]) == pair_with_max_occurrences:
+                    unicode_code_point_list[write] = new_token_idx
+                    read += 2
                 else:
-                    i += 1
+                    unicode_code_point_list[write] = unicode_code_point_list[read]
+                    read += 1
+                write += 1
+            del unicode_code_point_list[write:]
         else:
             return unicode_code_point_list, False
 
         return unicode_code_point_list, True
 
-    def bpe(self) -> list:
+    def bpe(self, incremental: bool = False, verbose: bool = True, progress = None) -> list:
+        """
+        Run BPE training for up to `self.iterations` merges.
+
+        Args:
+            incremental: use `IncrementalBPETrainer`, which updates pair counts
+                in place instead of rescanning the whole sequence every merge.
+                Both engines produce the same vocabulary.
+            verbose: print per-iteration and summary lines; turn off when timing
+            progress: optional callback(iteration, vocab_size) called after every merge
+        """
+        log = print if verbose else _silent
         starting_vocab_size = len(self.idx_to_char)
-        unicode_code_point_list = self.encode(self.text)
+        unicode_code_point_list = self._encode_bytes(self.text)
         raw_text_token_count = len(unicode_code_point_list)
 
+        trainer = None
+        if incremental:
+            trainer = IncrementalBPETrainer(unicode_code_point_list, self.idx_to_char, self.char_to_idx)
+
         flag = True
         i = 0
         while flag and i < self.iterations:
-            print(f"Iteration: {i+1}")
-            unicode_code_point_list, flag = self._merge(unicode_code_point_list)
-            print(f"char_to_idx: {len(self.char_to_idx)} | idx_to_char: {len(self.idx_to_char)}")
-            print("==============================================================================")
+            log(f"Iteration: {i+1}")
+            if trainer is not None:
+                pair, new_token_idx = trainer.merge_next()
+                flag = pair is not None
+                if flag:
+                    self.merges[pair] = new_token_idx
+            else:
+                unicode_code_point_list, flag = self._merge(unicode_code_point_list)
+            log(f"char_to_idx: {len(self.char_to_idx)} | idx_to_char: {len(self.idx_to_char)}")
+            log("==============================================================================")
             i += 1
+            if flag and progress is not None:
+                progress(i, len(self.idx_to_char))
 
         if flag and self.iterations > 1:
-            print('Iterations completed')
+            log('Iterations completed')
+
+        if trainer is not None:
+            unicode_code_point_list = trainer.to_list()
 
         processed_text_token_count = len(unicode_code_point_list)
         final_vocab_size = len(self.idx_to_char)
         compression_ratio = (processed_text_token_count / raw_text_token_count) * 100
 
-        print(f"Starting vocab size: {starting_vocab_size}")
-        print(f"Final vocab size: {final_vocab_size}")
-        print(f"total tokens in raw text: {raw_text_token_count}")
-        print(f"total tokens after bpe: {processed_text_token_count}")
-        print(f"compression ratio: {compression_ratio}")
+        log(f"Starting vocab size: {starting_vocab_size}")
+        log(f"Final vocab size: {final_vocab_size}")
+        log(f"total tokens in raw text: {raw_text_token_count}")
+        log(f"total tokens after bpe: {processed_text_token_count}")
+        log(f"compression ratio: {compression_ratio}")
+
+        return unicode_code_point_list, self.idx_to_char, self.char_to_idx
+
+    def bpe_from_counts(self, chunk_counts: dict = None, processes: int = None, verbose: bool = True,
+                        progress = None) -> tuple:
+        """
+        Run BPE training from a chunk frequency table.
+
+        Args:
+            chunk_counts: Chunk -> frequency table; defaults to the one built by `from_blocks` / `from_file`
+            processes: Worker processes (defaults to the CPU count)
+            verbose: print per-iteration and summary lines
+            progress: optional callback(iteration, vocab_size) called after every merge
+        """
+        log = print if verbose else _silent
+        if chunk_counts is None:
+            chunk_counts = self.chunk_counts
+        if chunk_counts is None:
+            raise ValueError("No chunk counts to train on, build the tokenizer with from_file or from_blocks")
+
+        starting_vocab_size = len(self.idx_to_char)
+        trainer = ChunkBPETrainer(chunk_counts, self.idx_to_char, self.char_to_idx, processes)
+
+        i = 0
+        while i < self.iterations:
+            log(f"Iteration: {i+1}")
+            pair, new_token_idx = trainer.merge_next()
+            if pair is None:
+                break
+            self.merges[pair] = new_token_idx
+            log(f"char_to_idx: {len(self.char_to_idx)} | idx_to_char: {len(self.idx_to_char)}")
+            log("==============================================================================")
+            i += 1
+            if progress is not None:
+                progress(i, len(self.idx_to_char))
+
+        log(f"Starting vocab size: {starting_vocab_size}")
+        log(f"Final vocab size: {len(self.idx_to_char)}")
+        log(f"unique chunks: {len(chunk_counts)}")
+
+        return self.idx_to_char, self.char_to_idx
+
+    def bpe_chunked(self, pattern: str = SPLIT_PATTERN, shard_size: int = None, processes: int = None,
+                    verbose: bool = True, progress = None) -> list:
+        """
+        Run BPE training over unique pre-tokenized chunks weighted by frequency.
+
+        Chunk counting and the initial pair count run on a `multiprocessing` pool,
+        after which each merge only revisits the chunks that contain the merged
+        pair. Merges never cross chunk boundaries, so the tokenizer encodes with
+        the same split pattern afterwards.
+
+        Args:
+            pattern: Regex used to pre-tokenize the text
+            shard_size: Split into fixed-size shards of this many characters instead of using `pattern`
+            processes: Worker processes (defaults to the CPU count)
+            verbose: print per-iteration and summary lines
+            progress: optional callback(iteration, vocab_size) called after every merge
+        """
+        log = print if verbose else _silent
+        chunk_counts = count_chunks(self.text, pattern, shard_size, processes)
+        self.bpe_from_counts(chunk_counts, processes, verbose, progress)
+
+        self.split_pattern = None if shard_size else pattern
+        unicode_code_point_list = self.encode(self.text)
+        log(f"total tokens after bpe: {len(unicode_code_point_list)}")
 
         return unicode_code_point_list, self.idx_to_char, self.char_to_idx
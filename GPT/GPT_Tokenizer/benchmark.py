@@ -0,0 +1,272 @@
+"""
+Tokenizer benchmark and regression suite.
+
+Generates synthetic corpora locally, then measures per engine and corpus size:
+training time per merge, encode / decode throughput (MB/s), peak traced memory
+and compression ratio. Results are written as JSON; pass a previous results
+file with --baseline to flag regressions. Every timing is the best of several
+runs and its tolerance is widened by the spread between those runs, at most
+to twice --tolerance; measurements too small to be stable (see --min-ms /
+--min-mb) are reported but not gated.
+
+Usage:
+    python benchmark.py --sizes 100000 1000000 --merges 500 --output bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.2
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from BPE_Tokenizer import BPETokenizer
+from bpe_encoder import RankEncoder
+
+
+# the naive engine rescans the corpus every merge, only run it on small corpora
+NAIVE_MAX_SIZE = 200_000
+
+# metric -> True if higher is better
+TRACKED_METRICS = {
+    "train_ms_per_merge": False,
+    "encode_mb_s": True,
+    "decode_mb_s": True,
+    "decode_batch_mb_s": True,
+    "peak_mem_mb": False,
+}
+
+# below these a measurement is mostly timer / allocator noise, so such metrics are
+# reported but not compared against the relative tolerance
+MIN_TIMED_MS = 250.0
+MIN_TRACKED_MB = 1.0
+
+
+def generate_corpus(size: int, seed: int = 1337, lexicon_size: int = 5000) -> str:
+    """ASCII text with Zipf-distributed words, punctuation and paragraphs, `size` characters long."""
+    rng = random.Random(seed)
+    letters = "etaoinshrdlcumwfgypbvkjxqz"
+    weights = [12.7, 9.1, 8.2, 7.5, 7.0, 6.7, 6.3, 6.1, 6.0, 4.3, 4.0, 2.8, 2.8,
+               2.4, 2.4, 2.2, 2.0, 2.0, 1.9, 1.5, 1.0, 0.8, 0.2, 0.2, 0.1, 0.1]
+
+    lexicon = []
+    for _ in range(lexicon_size):
+        length = max(1, int(rng.gauss(5, 2)))
+        lexicon.append("".join(rng.choices(letters, weights, k=length)))
+    word_weights = [1 / (rank + 1) for rank in range(lexicon_size)]
+
+    parts = []
+    total = 0
+    while total < size:
+        sentence = rng.choices(lexicon, word_weights, k=rng.randint(4, 18))
+        sentence[0] = sentence[0].capitalize()
+        text = " ".join(sentence) + rng.choice([". ", ". ", ", ", "? ", "! "])
+        if rng.random() < 0.1:
+            text += "\n\n"
+        parts.append(text)
+        total += len(text)
+    return "".join(parts)[:size]
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _best_of(repeats: int, fn, *args):
+    """
+    Run `fn` `repeats` times and keep the fastest run, which is the least noisy estimate.
+
+    Returns (result, best_seconds, spread) where spread is how much slower the
+    slowest run was, relative to the fastest: the noise level of this measurement.
+    """
+    times = []
+    for _ in range(repeats):
+        result, seconds = _timed(fn, *args)
+        times.append(seconds)
+    best = min(times)
+    return result, best, (max(times) - best) / best if best else 0.0
+
+
+def _peak_memory_mb(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def _train(engine: str, text: str, merges: int, processes: int) -> BPETokenizer:
+    tokenizer = BPETokenizer(text, iterations=merges)
+    if engine == "naive":
+        tokenizer.bpe(verbose=False)
+    elif engine == "incremental":
+        tokenizer.bpe(incremental=True, verbose=False)
+    else:
+        tokenizer.bpe_chunked(processes=processes, verbose=False)
+    return tokenizer
+
+
+def bench_engine(engine: str, text: str, merges: int, processes: int, measure_memory: bool,
+                 repeats: int = 3) -> dict:
+    tokenizer, train_s, train_noise = _best_of(repeats, _train, engine, text, merges, processes)
+    n_merges = max(len(tokenizer.merges), 1)
+    mb = len(text.encode("utf-8")) / 2 ** 20
+
+    # fresh encoder per run so the chunk cache does not turn later repeats into lookups
+    def encode():
+        return RankEncoder(tokenizer.char_to_idx, tokenizer.merges, pattern=tokenizer.split_pattern).encode(text)
+
+    tokens, encode_s, encode_noise = _best_of(repeats, encode)
+    decoded, decode_s, decode_noise = _best_of(repeats, tokenizer.decode, tokens)
+
+    result = {
+        "merges": len(tokenizer.merges),
+        "train_s": round(train_s, 4),
+        "train_ms_per_merge": round(1000 * train_s / n_merges, 4),
+        "encode_mb_s": round(mb / encode_s, 3),
+        "decode_mb_s": round(mb / decode_s, 3),
+        "tokens": len(tokens),
+        "compression_ratio": round(len(tokens) / len(text), 4),
+        "roundtrip_ok": decoded == text,
+        "noise": {
+            "train_ms_per_merge": round(train_noise, 4),
+            "encode_mb_s": round(encode_noise, 4),
+            "decode_mb_s": round(decode_noise, 4),
+        },
+    }
+
+    try:
+        tokenizer.decode_batch(tokens[:1])
+        decoded_batch, decode_batch_s, decode_batch_noise = _best_of(repeats, tokenizer.decode_batch, tokens)
+        result["decode_batch_mb_s"] = round(mb / decode_batch_s, 3)
+        result["noise"]["decode_batch_mb_s"] = round(decode_batch_noise, 4)
+        result["roundtrip_ok"] = result["roundtrip_ok"] and decoded_batch == text
+    except ImportError:
+        pass
+
+    if measure_memory:
+        result["peak_mem_mb"] = round(_peak_memory_mb(lambda: _train(engine, text, merges, processes)), 2)
+
+    return result
+
+
+def run(sizes: list, merges: int, engines: list, processes: int, measure_memory: bool) -> dict:
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "merges": merges,
+        "runs": [],
+    }
+
+    for size in sizes:
+        text = generate_corpus(size)
+        for engine in engines:
+            if engine == "naive" and size > NAIVE_MAX_SIZE:
+                continue
+            print(f"{engine:>12} | {size:>10} chars ...", file=sys.stderr, flush=True)
+            run_result = {"engine": engine, "size": size}
+            run_result.update(bench_engine(engine, text, merges, processes, measure_memory))
+            results["runs"].append(run_result)
+
+    if "naive" in engines and "incremental" in engines:
+        text = generate_corpus(min(sizes[0], NAIVE_MAX_SIZE))
+        naive = _train("naive", text, merges, processes)
+        incremental = _train("incremental", text, merges, processes)
+        results["incremental_matches_naive"] = naive.idx_to_char == incremental.idx_to_char
+
+    return results
+
+
+def _measured_amount(run: dict, metric: str) -> tuple:
+    """The absolute quantity behind a metric as (value, unit): milliseconds timed or MB allocated."""
+    if metric == "peak_mem_mb":
+        return run[metric], "mb"
+    if metric == "train_ms_per_merge":
+        return 1000 * run["train_s"], "ms"
+    # throughputs: how long the measured pass over the corpus took
+    return 1000 * run["size"] / 2 ** 20 / run[metric], "ms"
+
+
+def compare(results: dict, baseline: dict, tolerance: float,
+            min_ms: float = MIN_TIMED_MS, min_mb: float = MIN_TRACKED_MB) -> list:
+    """
+    Return a description of every tracked metric that got worse than the baseline by more than `tolerance`.
+
+    Metrics whose baseline measurement took less than `min_ms` or allocated less
+    than `min_mb` are skipped: their run-to-run noise exceeds any sane tolerance.
+    The tolerance of a timing is widened by the larger spread between repeats
+    seen in either run, up to twice `tolerance`, so a noisy machine does not
+    report its own jitter.
+    """
+    floors = {"ms": min_ms, "mb": min_mb}
+    previous = {(run["engine"], run["size"]): run for run in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        old = previous.get((run["engine"], run["size"]))
+        if old is None:
+            continue
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            if metric not in run or metric not in old or not old[metric]:
+                continue
+            amount, unit = _measured_amount(old, metric)
+            if amount < floors[unit]:
+                continue
+            noise = max(run.get("noise", {}).get(metric, 0.0), old.get("noise", {}).get(metric, 0.0))
+            # a noisy machine may at most double the tolerance, never switch the gate off
+            allowed = tolerance + min(noise, tolerance)
+            change = (run[metric] - old[metric]) / old[metric]
+            if (higher_is_better and change < -allowed) or (not higher_is_better and change > allowed):
+                regressions.append(
+                    f"{run['engine']} @ {run['size']}: {metric} {old[metric]} -> {run[metric]} ({change:+.1%})"
+                )
+        if old.get("roundtrip_ok") and not run.get("roundtrip_ok"):
+            regressions.append(f"{run['engine']} @ {run['size']}: roundtrip broke")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the BPE tokenizer")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50_000, 200_000, 1_000_000])
+    parser.add_argument("--merges", type=int, default=300)
+    parser.add_argument("--engines", nargs="+", default=["naive", "incremental", "chunked"],
+                        choices=["naive", "incremental", "chunked"])
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--min-ms", type=float, default=MIN_TIMED_MS,
+                        help="only compare timings whose baseline took at least this long")
+    parser.add_argument("--min-mb", type=float, default=MIN_TRACKED_MB,
+                        help="only compare memory whose baseline was at least this large")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.merges, args.engines, args.processes, not args.no_memory)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_ms, args.min_mb)
+        results["regressions"] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    for regression in regressions:
+        print(f"REGRESSION: {regression}", file=sys.stderr)
+    failed = regressions or not all(run["roundtrip_ok"] for run in results["runs"])
+    failed = failed or results.get("incremental_matches_naive") is False
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import codecs
+
+import numpy as np
+
+try:
+    from .tokenizer_file import TokenTable
+except ImportError:
+    from tokenizer_file import TokenTable
+
+
+def _as_numpy(tokens) -> np.ndarray:
+    # torch tensors (possibly on GPU) expose detach/cpu/numpy
+    if hasattr(tokens, 'detach'):
+        tokens = tokens.detach().cpu().numpy()
+    return np.asarray(tokens, dtype=np.int64)
+
+
+class DecodeTable:
+    """
+    All token bytes concatenated into one uint8 array plus an offset table.
+
+    Decoding a batch is then a single gather: the byte ranges of every token are
+    expanded with a cumulative-sum / arange trick and pulled out of the blob in
+    one fancy-indexing call, instead of joining a Python list of bytes objects.
+    """
+
+    def __init__(self, idx_to_char):
+        if isinstance(idx_to_char, TokenTable):
+            # a memory-mapped vocabulary already has this layout, reuse it without copying
+            self.blob = np.frombuffer(idx_to_char._blob, dtype=np.uint8)
+            self.offsets = np.frombuffer(idx_to_char._offsets, dtype=np.uint32).astype(np.int64)
+        else:
+            tokens = [idx_to_char[idx] for idx in range(len(idx_to_char))]
+            self.blob = np.frombuffer(b''.join(tokens), dtype=np.uint8)
+            self.offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+            np.cumsum([len(token) for token in tokens], out=self.offsets[1:])
+        self.lengths = np.diff(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def to_bytes(self, tokens) -> bytes:
+        ids = _as_numpy(tokens).ravel()
+        starts = self.offsets[ids]
+        lengths = self.lengths[ids]
+
+        total = int(lengths.sum())
+        if total == 0:
+            return b''
+        # for every output byte: start of its token + position inside the token
+        token_starts_in_output = np.cumsum(lengths) - lengths
+        gather = np.repeat(starts - token_starts_in_output, lengths) + np.arange(total)
+        return self.blob[gather].tobytes()
+
+    def decode(self, tokens, errors: str = 'replace'):
+        """
+        Decode a 1-D array to a string, or a 2-D (batch, time) array to a list of strings.
+
+        Args:
+            tokens: NumPy array, torch tensor or list of token ids
+            errors: How to handle byte sequences that are not valid UTF-8
+        """
+        ids = _as_numpy(tokens)
+        if ids.ndim == 2:
+            return [self.to_bytes(row).decode('utf-8', errors=errors) for row in ids]
+        return self.to_bytes(ids).decode('utf-8', errors=errors)
+
+
+class IncrementalDecoder:
+    """
+    Decodes tokens one at a time, e.g. while sampling from a model.
+
+    Bytes of a UTF-8 character split across tokens are held back until the
+    character is complete, so every returned string is valid text.
+    """
+
+    def __init__(self, idx_to_char, errors: str = 'replace'):
+        self.idx_to_char = idx_to_char
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors=errors)
+
+    def push(self, token: int) -> str:
+        return self._decoder.decode(self.idx_to_char[int(token)])
+
+    def push_many(self, tokens) -> str:
+        return self._decoder.decode(b''.join(self.idx_to_char[int(token)] for token in tokens))
+
+    def flush(self) -> str:
+        """Return whatever is still buffered, replacing an incomplete trailing character."""
+        return self._decoder.decode(b'', final=True)
+
+    def reset(self):
+        self._decoder.reset()
@@ -0,0 +1,167 @@
+import heapq
+import re
+from functools import lru_cache
+
+try:
+    from .token_sequence import TokenSequence
+except ImportError:
+    from token_sequence import TokenSequence
+
+
+# GPT-2 style pre-tokenization, spelled with `re` classes instead of \p{L} / \p{N}:
+# contractions, words, numbers and punctuation runs (each with one optional leading
+# space), then whitespace. Every character falls in exactly one alternative.
+SPLIT_PATTERN = r"""'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d+| ?(?:[^\s\w]|_)+|\s+(?!\S)|\s+"""
+
+# chunks shorter than this go through the simple quadratic merge loop
+SHORT_CHUNK = 64
+
+
+def merges_from_vocab(idx_to_char: dict, char_to_idx: dict = None) -> dict:
+    """
+    Rebuild an ordered merge table from a vocabulary that was saved without one.
+
+    Every token that is the concatenation of two older tokens is treated as their
+    merge. When several splits are possible the first one found is used, so
+    encodings may differ from the training-time segmentation while still decoding
+    to the same text.
+
+    Returns:
+        Dictionary of (left_idx, right_idx) -> merged_idx in merge order
+    """
+    if char_to_idx is None:
+        char_to_idx = {token: idx for idx, token in idx_to_char.items()}
+
+    merges = {}
+    for idx in sorted(idx_to_char):
+        token = idx_to_char[idx]
+        for split in range(1, len(token)):
+            left = char_to_idx.get(token[:split])
+            right = char_to_idx.get(token[split:])
+            if left is not None and right is not None and left < idx and right < idx:
+                merges[(left, right)] = idx
+                break
+    return merges
+
+
+def base_tokens(chunk: str, char_to_idx: dict) -> list:
+    """Map text to base vocabulary ids: one id per character, or per byte if the character is not a token."""
+    ids = []
+    for char in chunk:
+        key = char.encode('utf-8')
+        idx = char_to_idx.get(key)
+        if idx is not None:
+            ids.append(idx)
+            continue
+        for b in key:
+            idx = char_to_idx.get(bytes([b]))
+            if idx is None:
+                raise ValueError(f"Character {char!r} is not in the tokenizer vocabulary")
+            ids.append(idx)
+    return ids
+
+
+class RankEncoder:
+    """
+    Applies learned BPE merges in rank order, tiktoken style.
+
+    A merge's rank is the id of the token it produces, so a lower id means an
+    earlier merge. Text is optionally split into chunks with `pattern`; each
+    chunk is mapped to base tokens and its lowest-rank pair is merged until no
+    known pair is left. Encoded chunks are kept in an LRU cache.
+
+    Use `pattern=None` for vocabularies trained over the raw stream (which may
+    contain merges that cross word boundaries): the whole text is then encoded
+    as a single chunk, which reproduces the training segmentation exactly.
+    """
+
+    def __init__(self, char_to_idx: dict, merges: dict, pattern: str = SPLIT_PATTERN,
+                 cache_size: int = 2 ** 16, max_cached_len: int = 256):
+        self.char_to_idx = char_to_idx
+        self.ranks = dict(merges)
+        self.pattern = re.compile(pattern) if pattern else None
+        self.max_cached_len = max_cached_len
+        self._encode_cached = lru_cache(maxsize=cache_size)(self._encode_chunk)
+
+    def _merge_short(self, ids: list) -> list:
+        ranks = self.ranks
+        while len(ids) >= 2:
+            pair = min(zip(ids, ids[1:]), key=lambda p: ranks.get(p, float('inf')))
+            new_token_idx = ranks.get(pair)
+            if new_token_idx is None:
+                break
+
+            merged = []
+            i = 0
+            while i < len(ids):
+                if i < len(ids) - 1 and ids[i] == pair[0] and ids[i + 1] == pair[1]:
+                    merged.append(new_token_idx)
+                    i += 2
+                else:
+                    merged.append(ids[i])
+                    i += 1
+            ids = merged
+        return ids
+
+    def _merge_long(self, ids: list) -> list:
+        ranks = self.ranks
+        sequence = TokenSequence(ids)
+        tokens = sequence.tokens
+
+        positions = {}
+        for i in range(len(tokens) - 1):
+            pair = (tokens[i], tokens[i + 1])
+            if pair in ranks:
+                positions.setdefault(pair, []).append(i)
+        heap = [(ranks[pair], pair) for pair in positions]
+        heapq.heapify(heap)
+
+        def track(pair, pos):
+            # a merge can only create pairs of higher rank, so ascending order is preserved
+            if pair in ranks:
+                if pair not in positions:
+                    positions[pair] = []
+                    heapq.heappush(heap, (ranks[pair], pair))
+                positions[pair].append(pos)
+
+        while heap:
+            new_token_idx, pair = heapq.heappop(heap)
+            for pos in sorted(positions.pop(pair)):
+                if not sequence.is_pair_at(pos, pair):
+                    continue
+                left = sequence.prev[pos]
+                sequence.merge_at(pos, new_token_idx)
+                after = sequence.next[pos]
+                if left != -1:
+                    track((tokens[left], new_token_idx), left)
+                if after != -1:
+                    track((new_token_idx, tokens[after]), pos)
+
+        return sequence.to_list()
+
+    def _encode_chunk(self, chunk: str) -> tuple:
+        ids = base_tokens(chunk, self.char_to_idx)
+        if len(ids) < SHORT_CHUNK:
+            return tuple(self._merge_short(ids))
+        return tuple(self._merge_long(ids))
+
+    def _chunks(self, text: str):
+        if self.pattern is None:
+            return [text]
+        return self.pattern.findall(text)
+
+    def encode(self, text: str) -> list:
+        tokens = []
+        for chunk in self._chunks(text):
+            if len(chunk) <= self.max_cached_len:
+                tokens.extend(self._encode_cached(chunk))
+            else:
+                tokens.extend(self._encode_chunk(chunk))
+        return tokens
+
+    def encode_batch(self, texts) -> list:
+        """Encode many strings in one call; chunks repeated across strings hit the cache."""
+        return [self.encode(text) for text in texts]
+
+    def cache_info(self):
+        return self._encode_cached.cache_info()
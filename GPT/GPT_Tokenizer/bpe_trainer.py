@@ -0,0 +1,126 @@
+import heapq
+
+try:
+    from .token_sequence import TokenSequence
+except ImportError:
+    from token_sequence import TokenSequence
+
+
+class IncrementalBPETrainer:
+    """
+    BPE training engine that keeps pair counts up to date between merges.
+
+    The token sequence is held as a `TokenSequence` (a doubly linked list over
+    the original positions), every pair keeps a heap of the positions it
+    occurs at, and a global max-heap keyed on (-count, first_position) picks
+    the next merge.
+    A merge only rewrites the neighbours of the positions it touches, so the
+    cost of one merge is proportional to the number of occurrences of the
+    merged pair instead of the length of the corpus.
+
+    Merge selection matches `BPETokenizer._merge`: the pair with the highest
+    (overlapping) count wins, ties go to the pair that occurs first in the
+    sequence, and training stops once no pair occurs more than once.
+    """
+
+    def __init__(self, unicode_code_point_list: list, idx_to_char: dict, char_to_idx: dict):
+        self.idx_to_char = idx_to_char
+        self.char_to_idx = char_to_idx
+
+        self.sequence = TokenSequence(unicode_code_point_list)
+        tokens = self.sequence.tokens
+
+        self.counts = {}
+        self.positions = {}
+        for i in range(len(tokens) - 1):
+            pair = (tokens[i], tokens[i + 1])
+            self.counts[pair] = self.counts.get(pair, 0) + 1
+            # positions are appended in ascending order, so each list is already a heap
+            self.positions.setdefault(pair, []).append(i)
+
+        self.heap = [(-count, self.positions[pair][0], pair) for pair, count in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def _first_position(self, pair: tuple) -> int:
+        # positions never become valid again once invalidated, so stale heads can be dropped
+        positions = self.positions[pair]
+        while not self.sequence.is_pair_at(positions[0], pair):
+            heapq.heappop(positions)
+        return positions[0]
+
+    def _best_pair(self):
+        while self.heap:
+            neg_count, first, pair = self.heap[0]
+            count = self.counts.get(pair, 0)
+            if count and -neg_count == count and self._first_position(pair) == first:
+                return pair, count
+            heapq.heappop(self.heap)
+        return None, 0
+
+    def _remove(self, pair: tuple, changed: set):
+        self.counts[pair] -= 1
+        changed.add(pair)
+
+    def _add(self, pair: tuple, pos: int, changed: set):
+        self.counts[pair] = self.counts.get(pair, 0) + 1
+        heapq.heappush(self.positions.setdefault(pair, []), pos)
+        changed.add(pair)
+
+    def merge_next(self) -> tuple:
+        """
+        Perform one merge in place.
+
+        Returns:
+            (merged_pair, new_token_idx), or (None, None) once no pair occurs more than once
+        """
+        pair, count = self._best_pair()
+        if pair is None or count <= 1:
+            return None, None
+
+        new_token = self.idx_to_char[pair[0]] + self.idx_to_char[pair[1]]
+        new_token_idx = len(self.idx_to_char)
+        self.char_to_idx[new_token] = new_token_idx
+        self.idx_to_char[new_token_idx] = new_token
+
+        sequence = self.sequence
+        tokens, prev, nxt = sequence.tokens, sequence.prev, sequence.next
+        changed = set()
+
+        for pos in sorted(self.positions[pair]):
+            if not sequence.is_pair_at(pos, pair):
+                continue
+
+            left = prev[pos]
+            right = nxt[pos]
+            after = nxt[right]
+
+            if left != -1:
+                self._remove((tokens[left], tokens[pos]), changed)
+            self._remove(pair, changed)
+            if after != -1:
+                self._remove((tokens[right], tokens[after]), changed)
+
+            sequence.merge_at(pos, new_token_idx)
+
+            if left != -1:
+                self._add((tokens[left], new_token_idx), left, changed)
+            if after != -1:
+                self._add((new_token_idx, tokens[after]), pos, changed)
+
+        del self.counts[pair]
+        del self.positions[pair]
+        changed.discard(pair)
+
+        for changed_pair in changed:
+            count = self.counts[changed_pair]
+            if count:
+                heapq.heappush(self.heap, (-count, self._first_position(changed_pair), changed_pair))
+            else:
+                del self.counts[changed_pair]
+                del self.positions[changed_pair]
+
+        return pair, new_token_idx
+
+    def to_list(self) -> list:
+        """Return the current token sequence as a plain list."""
+        return self.sequence.to_list()
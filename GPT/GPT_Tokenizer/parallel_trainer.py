@@ -0,0 +1,271 @@
+import heapq
+import os
+import re
+from collections import Counter
+from multiprocessing import Pool
+
+try:
+    from .bpe_encoder import SPLIT_PATTERN, base_tokens
+except ImportError:
+    from bpe_encoder import SPLIT_PATTERN, base_tokens
+
+
+# a shard may only end right after a lone newline that is followed by a non-space
+# character; the split pattern never lets a chunk cross such a boundary
+SHARD_BOUNDARY = re.compile(r"(?<=\S\n)(?=\S)")
+# no chunk continues from a letter or digit into the whitespace after it either;
+# used when a streamed block has no newline boundary within `max_carry`
+WORD_END = re.compile(r"(?<=[^\W_])(?=\s)")
+
+
+def split_shards(text: str, parts: int) -> list:
+    """Split text into roughly equal shards without cutting through a pre-tokenized chunk."""
+    if parts <= 1 or not text:
+        return [text]
+
+    size = len(text) // parts + 1
+    shards = []
+    start = 0
+    while start < len(text):
+        boundary = SHARD_BOUNDARY.search(text, start + size)
+        end = boundary.start() if boundary else len(text)
+        shards.append(text[start:end])
+        start = end
+    return shards
+
+
+def _count_piece(args) -> Counter:
+    piece, pattern, shard_size = args
+    if shard_size:
+        return Counter(piece[i:i + shard_size] for i in range(0, len(piece), shard_size))
+    return Counter(re.findall(pattern, piece))
+
+
+def _count_pairs(args) -> tuple:
+    chunks, freqs, char_to_idx = args
+    words = []
+    stats = {}
+    for chunk, freq in zip(chunks, freqs):
+        word = base_tokens(chunk, char_to_idx)
+        words.append(word)
+        for pair in zip(word, word[1:]):
+            stats[pair] = stats.get(pair, 0) + freq
+    return words, stats
+
+
+def count_chunks(text: str, pattern: str = SPLIT_PATTERN, shard_size: int = None,
+                 processes: int = None) -> Counter:
+    """
+    Count the unique chunks of a text.
+
+    Args:
+        text: Text to split
+        pattern: Regex used to pre-tokenize the text; ignored when `shard_size` is set
+        shard_size: Split into fixed-size shards of this many characters instead
+        processes: Worker processes for the regex pass (defaults to the CPU count)
+
+    Returns:
+        Counter of chunk -> frequency, in order of first occurrence
+    """
+    if shard_size:
+        return _count_piece((text, pattern, shard_size))
+
+    processes = processes or os.cpu_count() or 1
+    shards = split_shards(text, processes)
+    if len(shards) == 1:
+        return _count_piece((text, pattern, None))
+
+    counts = Counter()
+    with Pool(processes) as pool:
+        for shard_counts in pool.imap(_count_piece, [(shard, pattern, None) for shard in shards]):
+            counts.update(shard_counts)
+    return counts
+
+
+def _last_boundary(buffer: str, max_carry: int) -> int:
+    pos = buffer.rfind('\n')
+    while pos > 0:
+        if pos + 1 < len(buffer) and not buffer[pos - 1].isspace() and not buffer[pos + 1].isspace():
+            return pos + 1
+        pos = buffer.rfind('\n', 0, pos)
+
+    if len(buffer) <= max_carry:
+        return 0
+    # no newline to cut at: cut after the last word instead; a tail whitespace
+    # run may still grow, so never cut inside or right after one
+    last = None
+    for last in WORD_END.finditer(buffer):
+        pass
+    return last.start() if last else 0
+
+
+def stream_pieces(blocks, shard_size: int = None, max_carry: int = 1 << 20):
+    """
+    Re-cut an iterator of text blocks into pieces that never split a pre-tokenized chunk (or a fixed-size shard).
+
+    Pieces end after a lone newline followed by a non-space character, or, once
+    the carried tail exceeds `max_carry`, after the last letter or digit that
+    is followed by whitespace; with no such spot the tail keeps growing.
+    """
+    carry = ''
+    for block in blocks:
+        buffer = carry + block
+        if shard_size:
+            end = len(buffer) - len(buffer) % shard_size
+        else:
+            end = _last_boundary(buffer, max_carry)
+        if end:
+            yield buffer[:end]
+        carry = buffer[end:]
+    if carry:
+        yield carry
+
+
+def stream_chunk_counts(blocks, pattern: str = SPLIT_PATTERN, shard_size: int = None,
+                        processes: int = None, max_carry: int = 1 << 20) -> Counter:
+    """
+    Count the unique chunks of a text delivered as an iterator of blocks.
+
+    Blocks are re-cut at chunk-safe boundaries and counted on a worker pool with
+    a bounded number of pieces in flight, so memory is proportional to the
+    number of unique chunks rather than the size of the corpus.
+
+    Args:
+        blocks: Iterable of text blocks, e.g. successive `file.read(n)` results
+        pattern: Regex used to pre-tokenize the text; ignored when `shard_size` is set
+        shard_size: Split into fixed-size shards of this many characters instead
+        processes: Worker processes (defaults to the CPU count)
+        max_carry: Tail length beyond which blocks are also cut after a word, not only after a newline
+
+    Returns:
+        Counter of chunk -> frequency, in order of first occurrence
+    """
+    processes = processes or os.cpu_count() or 1
+    pieces = ((piece, pattern, shard_size) for piece in stream_pieces(blocks, shard_size, max_carry))
+    counts = Counter()
+
+    if processes == 1:
+        for args in pieces:
+            counts.update(_count_piece(args))
+        return counts
+
+    with Pool(processes) as pool:
+        pending = []
+        for args in pieces:
+            pending.append(pool.apply_async(_count_piece, (args,)))
+            if len(pending) >= 2 * processes:
+                counts.update(pending.pop(0).get())
+        for result in pending:
+            counts.update(result.get())
+    return counts
+
+
+class ChunkBPETrainer:
+    """
+    BPE training over unique chunks weighted by their frequency.
+
+    Mapping chunks to base tokens and the initial pair count are spread over a
+    `multiprocessing` pool. After that every merge only revisits the unique
+    chunks that contain the merged pair, and pair counts are updated from the
+    chunks it rewrote. Merges never cross chunk boundaries.
+
+    Ties between equally frequent pairs go to the smallest pair of ids, which
+    keeps training deterministic regardless of how the work was split.
+
+    On platforms that spawn workers (Windows, macOS) construct the trainer under
+    an `if __name__ == "__main__":` guard.
+    """
+
+    def __init__(self, chunk_counts: dict, idx_to_char: dict, char_to_idx: dict, processes: int = None):
+        self.idx_to_char = idx_to_char
+        self.char_to_idx = char_to_idx
+
+        chunks = list(chunk_counts)
+        self.freqs = [chunk_counts[chunk] for chunk in chunks]
+
+        processes = processes or os.cpu_count() or 1
+        batch_size = len(chunks) // processes + 1
+        batches = [
+            (chunks[i:i + batch_size], self.freqs[i:i + batch_size], char_to_idx)
+            for i in range(0, len(chunks), batch_size)
+        ]
+
+        if processes > 1 and len(batches) > 1:
+            with Pool(processes) as pool:
+                results = pool.map(_count_pairs, batches)
+        else:
+            results = [_count_pairs(batch) for batch in batches]
+
+        self.words = []
+        self.counts = {}
+        for words, stats in results:
+            self.words.extend(words)
+            for pair, count in stats.items():
+                self.counts[pair] = self.counts.get(pair, 0) + count
+
+        self.pair_words = {}
+        for word_idx, word in enumerate(self.words):
+            for pair in zip(word, word[1:]):
+                self.pair_words.setdefault(pair, set()).add(word_idx)
+
+        self.heap = [(-count, pair) for pair, count in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def _best_pair(self):
+        while self.heap:
+            neg_count, pair = self.heap[0]
+            if self.counts.get(pair, 0) == -neg_count:
+                return pair, -neg_count
+            heapq.heappop(self.heap)
+        return None, 0
+
+    def merge_next(self) -> tuple:
+        """
+        Perform one merge.
+
+        Returns:
+            (merged_pair, new_token_idx), or (None, None) once no pair occurs more than once
+        """
+        pair, count = self._best_pair()
+        if pair is None or count <= 1:
+            return None, None
+
+        new_token = self.idx_to_char[pair[0]] + self.idx_to_char[pair[1]]
+        new_token_idx = len(self.idx_to_char)
+        self.char_to_idx[new_token] = new_token_idx
+        self.idx_to_char[new_token_idx] = new_token
+
+        changed = set()
+        for word_idx in self.pair_words.pop(pair):
+            word = self.words[word_idx]
+            freq = self.freqs[word_idx]
+
+            merged = []
+            i = 0
+            while i < len(word):
+                if i < len(word) - 1 and word[i] == pair[0] and word[i + 1] == pair[1]:
+                    merged.append(new_token_idx)
+                    i += 2
+                else:
+                    merged.append(word[i])
+                    i += 1
+
+            for old_pair in zip(word, word[1:]):
+                self.counts[old_pair] -= freq
+                changed.add(old_pair)
+            for new_pair in zip(merged, merged[1:]):
+                self.counts[new_pair] = self.counts.get(new_pair, 0) + freq
+                self.pair_words.setdefault(new_pair, set()).add(word_idx)
+                changed.add(new_pair)
+
+            self.words[word_idx] = merged
+
+        for changed_pair in changed:
+            count = self.counts[changed_pair]
+            if count > 0:
+                heapq.heappush(self.heap, (-count, changed_pair))
+            else:
+                del self.counts[changed_pair]
+                self.pair_words.pop(changed_pair, None)
+
+        return pair, new_token_idx
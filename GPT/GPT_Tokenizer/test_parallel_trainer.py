@@ -0,0 +1,38 @@
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from parallel_trainer import count_chunks, stream_chunk_counts
+
+
+def blocks(text: str, size: int):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+def test_blank_line_paragraphs():
+    # no lone newline to cut at, so every cut falls back to max_carry
+    text = "word\n\nword\n\n" * 40
+    expected = count_chunks(text, processes=1)
+    for block_size in (1, 7, 64):
+        for max_carry in (0, 10, 1 << 20):
+            streamed = stream_chunk_counts(blocks(text, block_size), processes=1, max_carry=max_carry)
+            assert streamed == expected, (block_size, max_carry, dict(streamed), dict(expected))
+
+
+def test_random_whitespace_runs():
+    rng = random.Random(1337)
+    alphabet = ["word", "a1", "x.", "it's", "42", "_", "é", " ", "  ", "\t", "\n", "\n\n", " \n "]
+    for _ in range(200):
+        text = "".join(rng.choice(alphabet) for _ in range(100))
+        expected = count_chunks(text, processes=1)
+        for block_size in (1, 5, 13):
+            streamed = stream_chunk_counts(blocks(text, block_size), processes=1, max_carry=8)
+            assert streamed == expected, (text, block_size)
+
+
+if __name__ == "__main__":
+    test_blank_line_paragraphs()
+    test_random_whitespace_runs()
+    print("All streaming chunk count tests passed")
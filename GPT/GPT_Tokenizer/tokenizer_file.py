@@ -0,0 +1,151 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+
+# File layout, all integers little-endian uint32 unless noted:
+#   header   magic (6 bytes), version (uint16), n_tokens, n_merges, pattern_len, blob_len
+#   pattern  utf-8 split pattern (pattern_len bytes, empty means None), zero-padded to 4 bytes
+#   offsets  n_tokens + 1 byte offsets into the blob, token i is blob[offsets[i]:offsets[i + 1]]
+#   merges   n_merges (left, right, merged) triples in merge order
+#   blob     concatenated token bytes
+MAGIC = b"BPETOK"
+VERSION = 1
+HEADER = struct.Struct("<6sHIIII")
+
+
+class TokenizerFormatError(ValueError):
+    """The file is not a complete tokenizer file of a supported version."""
+
+
+def _uint32_view(buffer, start: int, count: int):
+    view = memoryview(buffer)[start:start + 4 * count]
+    if sys.byteorder == 'little':
+        return view.cast('I')
+    values = array('I', view)
+    values.byteswap()
+    return values
+
+
+class TokenTable(Mapping):
+    """Read-only idx -> token bytes mapping backed by the offset table and blob of a tokenizer file."""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __getitem__(self, idx: int) -> bytes:
+        if not 0 <= idx < len(self):
+            raise KeyError(idx)
+        return bytes(self._blob[self._offsets[idx]:self._offsets[idx + 1]])
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+
+class ReverseTokenMap(Mapping):
+    """token bytes -> idx mapping that is only built the first time it is looked up."""
+
+    def __init__(self, table: TokenTable):
+        self._table = table
+        self._index = None
+
+    def _built(self) -> dict:
+        if self._index is None:
+            self._index = {self._table[idx]: idx for idx in range(len(self._table))}
+        return self._index
+
+    def __getitem__(self, token: bytes) -> int:
+        return self._built()[token]
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __iter__(self):
+        return iter(self._built())
+
+
+def write_tokenizer(file_path: str, idx_to_char: dict, merges: dict, split_pattern: str = None):
+    """
+    Write a vocabulary and its ordered merge list to `file_path`.
+
+    Token ids must be contiguous from 0, which is how every trainer assigns them.
+    """
+    n_tokens = len(idx_to_char)
+    if sorted(idx_to_char) != list(range(n_tokens)):
+        raise ValueError("Token ids must be contiguous and start at 0")
+
+    offsets = array('I', [0])
+    blob = bytearray()
+    for idx in range(n_tokens):
+        blob += idx_to_char[idx]
+        offsets.append(len(blob))
+
+    merge_table = array('I')
+    for (left, right), merged in merges.items():
+        merge_table.extend((left, right, merged))
+
+    pattern = (split_pattern or "").encode('utf-8')
+    padding = b"\0" * (-len(pattern) % 4)
+
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+        merge_table.byteswap()
+
+    with open(file_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n_tokens, len(merges), len(pattern), len(blob)))
+        f.write(pattern + padding)
+        f.write(offsets.tobytes())
+        f.write(merge_table.tobytes())
+        f.write(blob)
+
+
+def read_tokenizer(file_path: str) -> tuple:
+    """
+    Memory-map a tokenizer file.
+
+    Returns:
+        (idx_to_char, char_to_idx, merges, split_pattern) where both vocabulary
+        maps read straight from the mapped file and the reverse map is built lazily
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        # validate the header before mapping: mmap rejects empty files and a
+        # short file would otherwise fail deep inside struct / memoryview
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise TokenizerFormatError(f"{file_path} is not a tokenizer file")
+        magic, version, n_tokens, n_merges, pattern_len, blob_len = HEADER.unpack(header)
+        if version != VERSION:
+            raise TokenizerFormatError(f"Unsupported tokenizer file version {version}, expected {VERSION}")
+
+        expected = (HEADER.size + pattern_len + (-pattern_len % 4) + 4 * (n_tokens + 1)
+                    + 4 * 3 * n_merges + blob_len)
+        if size < expected:
+            raise TokenizerFormatError(f"{file_path} is truncated: {size} bytes, expected {expected}")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    pos = HEADER.size
+    split_pattern = buffer[pos:pos + pattern_len].decode('utf-8') or None
+    pos += pattern_len + (-pattern_len % 4)
+
+    offsets = _uint32_view(buffer, pos, n_tokens + 1)
+    pos += 4 * (n_tokens + 1)
+
+    merge_table = _uint32_view(buffer, pos, 3 * n_merges)
+    pos += 4 * 3 * n_merges
+
+    blob = memoryview(buffer)[pos:pos + blob_len]
+
+    merges = {}
+    for i in range(0, 3 * n_merges, 3):
+        merges[(merge_table[i], merge_table[i + 1])] = merge_table[i + 2]
+
+    idx_to_char = TokenTable(offsets, blob)
+    return idx_to_char, ReverseTokenMap(idx_to_char), merges, split_pattern
@@ -0,0 +1,150 @@
+"""
+Vectorized, prefetching batch sampling for GPT_nano.
+
+Rows are gathered with one fancy-indexing call (window offsets + an arange
+broadcast) straight into reusable, optionally pinned, output buffers, and a
+background thread keeps the next few batches ready so the training loop never
+waits on the data path.
+"""
+import queue
+import threading
+
+import numpy as np
+import torch
+
+
+def gather_windows(split, ix: np.ndarray, width: int, out: np.ndarray = None) -> np.ndarray:
+    """
+    Read `width` consecutive tokens starting at every offset in `ix`.
+
+    Windows that fit inside one segment of `split` are gathered per segment in a
+    single vectorized call; the rare window that straddles two segments is
+    stitched with `split.read`.
+
+    Returns:
+        int64 array of shape (len(ix), width), written into `out` when given
+    """
+    if out is None:
+        out = np.empty((len(ix), width), dtype=np.int64)
+    window = np.arange(width)
+
+    seg_ids = np.searchsorted(split.starts, ix, side='right') - 1
+    for seg in np.unique(seg_ids):
+        segment = split.segments[seg]
+        rows = np.nonzero(seg_ids == seg)[0]
+        local = ix[rows] - split.starts[seg]
+        fits = local + width <= len(segment)
+
+        inside = rows[fits]
+        if len(inside):
+            out[inside] = segment[local[fits][:, None] + window]
+        for row in rows[~fits]:
+            out[row] = split.read(int(ix[row]), int(ix[row]) + width)
+    return out
+
+
+class BatchSampler:
+    """
+    Random (x, y) batches from a `TokenSplit`, optionally prefetched on a background thread.
+
+    Batches live in a ring of reusable buffers (pinned when CUDA is available).
+    On CPU a returned batch is only valid until the next `next()` call: the
+    prefetch thread refills its buffer as soon as a queue slot frees up. Clone
+    it if it has to outlive that.
+
+    Example:
+        with BatchSampler(train_data, batch_size=64, block_size=256, prefetch=4) as sampler:
+            for step in range(max_steps):
+                xb, yb = next(sampler)
+    """
+
+    def __init__(self, split, batch_size: int, block_size: int, prefetch: int = 2,
+                 device: str = 'cpu', seed: int = None):
+        self.split = split
+        self.batch_size = batch_size
+        self.block_size = block_size
+        self.prefetch = prefetch
+        self.device = torch.device(device)
+        self.rng = np.random.default_rng(seed)
+
+        pin = torch.cuda.is_available()
+        # one buffer per queued batch, one for the consumer and one being filled
+        # x and y are gathered separately so both come out contiguous
+        self.buffers = [
+            tuple(torch.empty((batch_size, block_size), dtype=torch.long, pin_memory=pin) for _ in range(2))
+            for _ in range(prefetch + 2)
+        ]
+        self._next_buffer = 0
+        # CUDA event per buffer marking the end of its last non-blocking device copy
+        self._copied = [None] * len(self.buffers)
+
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _fill(self) -> tuple:
+        slot = self._next_buffer
+        x, y = self.buffers[slot]
+        self._next_buffer = (slot + 1) % len(self.buffers)
+
+        # an asynchronous copy may still be reading this pinned buffer
+        if self._copied[slot] is not None:
+            self._copied[slot].synchronize()
+            self._copied[slot] = None
+
+        ix = self.rng.integers(0, len(self.split) - self.block_size, size=self.batch_size)
+        gather_windows(self.split, ix, self.block_size, out=x.numpy())
+        gather_windows(self.split, ix + 1, self.block_size, out=y.numpy())
+
+        if self.device.type == 'cuda':
+            x = x.to(self.device, non_blocking=True)
+            y = y.to(self.device, non_blocking=True)
+            self._copied[slot] = torch.cuda.Event()
+            self._copied[slot].record()
+        elif self.device.type != 'cpu':
+            x = x.to(self.device)
+            y = y.to(self.device)
+        return x, y
+
+    def sample(self) -> tuple:
+        """Produce one batch synchronously."""
+        return self._fill()
+
+    def _worker(self):
+        while not self._stop.is_set():
+            batch = self._fill()
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(batch, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def start(self):
+        if self._thread is None and self.prefetch > 0:
+            self._queue = queue.Queue(maxsize=self.prefetch)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._worker, name="batch-prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> tuple:
+        if self._thread is None:
+            return self.sample()
+        return self._queue.get()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,127 @@
+"""
+Incremental sampling for GPT_nano language models.
+
+The engine writes into one preallocated (B, T + max_new_tokens) buffer and asks
+the model only for the logits of the newest position each step, so the cost of
+a token does not grow with the length of what was generated before it.
+
+A model plugs in by implementing:
+    init_cache(batch_size, max_len) -> cache object or None
+    step(idx, cache) -> (B, vocab_size) logits for the token after idx[:, -1]
+
+`step` receives the whole (left-padded) prompt once, then a single (B, 1)
+token per step. Models with attention keep their past keys / values in a
+`KVCache`; the bigram model needs no cache at all.
+"""
+import torch
+from torch.nn import functional as F
+
+
+class KVCache:
+    """
+    Preallocated per-layer key / value buffers for attention models.
+
+    Args:
+        n_layers: Number of attention layers
+        batch_size: Number of sequences sampled together
+        n_heads: Attention heads per layer
+        max_len: Prompt length + max_new_tokens
+        head_dim: Size of one head
+    """
+
+    def __init__(self, n_layers: int, batch_size: int, n_heads: int, max_len: int, head_dim: int,
+                 device=None, dtype=torch.float32):
+        shape = (n_layers, batch_size, n_heads, max_len, head_dim)
+        self.keys = torch.zeros(shape, device=device, dtype=dtype)
+        self.values = torch.zeros(shape, device=device, dtype=dtype)
+        self.pos = 0
+
+    def update(self, layer: int, k: torch.Tensor, v: torch.Tensor) -> tuple:
+        """Store the (B, H, T_new, D) keys / values of `layer` and return everything cached so far."""
+        end = self.pos + k.shape[2]
+        self.keys[layer, :, :, self.pos:end] = k
+        self.values[layer, :, :, self.pos:end] = v
+        return self.keys[layer, :, :, :end], self.values[layer, :, :, :end]
+
+    def advance(self, n: int):
+        """Move past `n` positions once every layer has been updated."""
+        self.pos += n
+
+
+def _pad_prompts(prompts, pad_id: int) -> tuple:
+    """Left-pad a list of 1-D prompts so the last prompt token of every row lines up."""
+    prompts = [torch.as_tensor(prompt, dtype=torch.long).flatten() for prompt in prompts]
+    lengths = [len(prompt) for prompt in prompts]
+    if min(lengths) == 0:
+        raise ValueError("Every prompt needs at least one token")
+
+    idx = torch.full((len(prompts), max(lengths)), pad_id, dtype=torch.long)
+    for row, prompt in enumerate(prompts):
+        idx[row, idx.shape[1] - len(prompt):] = prompt
+    return idx, lengths
+
+
+def _sample(logits: torch.Tensor, temperature: float, top_k: int, generator: torch.Generator) -> torch.Tensor:
+    if temperature == 0:
+        return logits.argmax(dim=-1, keepdim=True)
+    logits = logits / temperature
+    if top_k is not None:
+        kth = torch.topk(logits, min(top_k, logits.shape[-1]), dim=-1).values[:, -1:]
+        logits = logits.masked_fill(logits < kth, float('-inf'))
+    probs = F.softmax(logits, dim=-1)
+    return torch.multinomial(probs, num_samples=1, generator=generator)
+
+
+class Generator:
+    """
+    Sample continuations for a batch of prompts.
+
+    Example:
+        engine = Generator(model)
+        out = engine.generate(torch.zeros((1, 1), dtype=torch.long), max_new_tokens=100)
+        texts = engine.generate([tokenizer.encode(p) for p in prompts], max_new_tokens=50)
+    """
+
+    def __init__(self, model, pad_id: int = 0):
+        self.model = model
+        self.pad_id = pad_id
+
+    @torch.inference_mode()
+    def generate(self, prompts, max_new_tokens: int, temperature: float = 1.0, top_k: int = None,
+                 generator: torch.Generator = None):
+        """
+        Args:
+            prompts: (B, T) tensor of prompts of equal length, or a list of 1-D prompts of any length
+            max_new_tokens: Tokens to sample per prompt
+            temperature: Softmax temperature, 0 means greedy
+            top_k: Only sample among the k most likely tokens
+
+        Returns:
+            (B, T + max_new_tokens) tensor for tensor input, otherwise a list of
+            1-D tensors holding each prompt followed by its continuation
+        """
+        if torch.is_tensor(prompts):
+            idx, lengths = prompts.long(), None
+        else:
+            idx, lengths = _pad_prompts(prompts, self.pad_id)
+
+        device = next(self.model.parameters()).device
+        B, T = idx.shape
+        out = torch.empty((B, T + max_new_tokens), dtype=torch.long, device=device)
+        out[:, :T] = idx
+
+        was_training = self.model.training
+        self.model.eval()
+        try:
+            cache = self.model.init_cache(B, T + max_new_tokens)
+            logits = self.model.step(out[:, :T], cache)
+            for t in range(T, T + max_new_tokens):
+                out[:, t:t + 1] = _sample(logits, temperature, top_k, generator)
+                if t + 1 < T + max_new_tokens:
+                    logits = self.model.step(out[:, t:t + 1], cache)
+        finally:
+            self.model.train(was_training)
+
+        if lengths is None:
+            return out
+        return [out[row, T - length:] for row, length in enumerate(lengths)]
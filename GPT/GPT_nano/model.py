@@ -0,0 +1,39 @@
+import torch.nn as nn
+from torch.nn import functional as F
+
+from generation import Generator
+
+
+class BigramLanguageModel(nn.Module):
+
+    def __init__(self, vocab_size):
+        super().__init__()
+        # each token directly reads off the logits for the next token from a lookup table
+        self.token_embedding_table = nn.Embedding(vocab_size, vocab_size)
+
+    def forward(self, idx, targets=None):
+
+        # idx and targets are both (B, T) tensor of integers
+        logits = self.token_embedding_table(idx) # (B, T, C) | Batch * Context Window * Vocab Size
+
+        if targets is None:
+            loss = None
+        else:
+            B, T, C = logits.shape
+            logits = logits.view(B*T, C)
+            targets = targets.view(B*T)
+            loss = F.cross_entropy(logits, targets)
+
+        return logits, loss
+
+    def init_cache(self, batch_size, max_len):
+        # a bigram model has no context to remember
+        return None
+
+    def step(self, idx, cache=None):
+        # only the last token matters, so this is a single row lookup per sequence
+        return self.token_embedding_table(idx[:, -1]) # (B, C)
+
+    def generate(self, idx, max_new_tokens, temperature=1.0, top_k=None):
+        # idx is a (B, T) array of indices in the current context
+        return Generator(self).generate(idx, max_new_tokens, temperature=temperature, top_k=top_k)
@@ -0,0 +1,166 @@
+"""
+Pre-tokenized, memory-mapped token shards for GPT_nano training.
+
+The corpus is encoded once with `write_token_shards` into raw uint16 / uint32
+files plus a `meta.json`. Training then opens them with `np.memmap`, so start-up
+does not re-encode the text and RAM use does not grow with the corpus.
+"""
+import json
+import os
+
+import numpy as np
+import torch
+
+from GPT_Tokenizer.parallel_trainer import stream_pieces
+
+from batch_sampler import gather_windows
+
+
+META_FILE = "meta.json"
+
+
+def token_dtype(vocab_size: int):
+    return np.uint16 if vocab_size <= 2 ** 16 else np.uint32
+
+
+def write_token_shards(tokenizer, file_path: str, out_dir: str, shard_tokens: int = 1 << 26,
+                       block_size: int = 1 << 20, encoding: str = 'utf-8') -> dict:
+    """
+    Encode a text file into fixed-size token shards.
+
+    With a split pattern the file is streamed in blocks, re-cut at
+    pre-tokenization boundaries and encoded piece by piece, so the text is never
+    fully loaded. A tokenizer without one (`split_pattern=None`) merges across
+    word boundaries, so any cut could change the tokens; its text is encoded in
+    a single call, exactly as `tokenizer.encode` would.
+
+    Args:
+        tokenizer: Trained `BPETokenizer`
+        file_path: Text corpus
+        out_dir: Directory for the shard files and meta.json
+        shard_tokens: Maximum number of tokens per shard file
+
+    Returns:
+        The metadata written to meta.json
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    vocab_size = len(tokenizer.idx_to_char)
+    dtype = token_dtype(vocab_size)
+
+    shards = []
+    buffer = np.empty(shard_tokens, dtype=dtype)
+    filled = 0
+
+    def flush(count):
+        name = f"shard_{len(shards):05d}.bin"
+        buffer[:count].tofile(os.path.join(out_dir, name))
+        shards.append({"file": name, "tokens": int(count)})
+
+    with open(file_path, 'r', encoding=encoding) as f:
+        if tokenizer.split_pattern is None:
+            pieces = [f.read()]
+        else:
+            pieces = stream_pieces(iter(lambda: f.read(block_size), ''))
+        for piece in pieces:
+            tokens = np.asarray(tokenizer.encode(piece), dtype=dtype)
+            while len(tokens):
+                take = min(len(tokens), shard_tokens - filled)
+                buffer[filled:filled + take] = tokens[:take]
+                filled += take
+                tokens = tokens[take:]
+                if filled == shard_tokens:
+                    flush(filled)
+                    filled = 0
+    if filled:
+        flush(filled)
+
+    meta = {
+        "dtype": np.dtype(dtype).name,
+        "vocab_size": vocab_size,
+        "total_tokens": sum(shard["tokens"] for shard in shards),
+        "shards": shards,
+    }
+    with open(os.path.join(out_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class TokenSplit:
+    """
+    A contiguous range of tokens spread over one or more memory-mapped segments.
+
+    Slicing returns an int64 torch tensor; only the requested window is read
+    from disk.
+    """
+
+    def __init__(self, segments: list):
+        self.segments = [segment for segment in segments if len(segment)]
+        lengths = [len(segment) for segment in self.segments]
+        self.starts = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+
+    def __len__(self) -> int:
+        return int(self.starts[-1])
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        """Tokens [start, stop) as a NumPy array, stitched across segment boundaries if needed."""
+        parts = []
+        seg = int(np.searchsorted(self.starts, start, side='right')) - 1
+        while start < stop and seg < len(self.segments):
+            offset = start - self.starts[seg]
+            take = min(stop - start, len(self.segments[seg]) - offset)
+            parts.append(self.segments[seg][offset:offset + take])
+            start += take
+            seg += 1
+        if len(parts) == 1:
+            return np.asarray(parts[0])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            index = int(index)
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError(f"token index out of range for {len(self)} tokens")
+            return int(self.read(index, index + 1)[0])
+        start, stop, step = index.indices(len(self))
+        return torch.from_numpy(self.read(start, stop)[::step].astype(np.int64))
+
+    def get_batch(self, batch_size: int, block_size: int, generator: torch.Generator = None) -> tuple:
+        """Sample `batch_size` random windows: inputs x and next-token targets y, both (B, T) int64."""
+        ix = torch.randint(len(self) - block_size, (batch_size, ), generator=generator).numpy()
+        x = torch.from_numpy(gather_windows(self, ix, block_size))
+        y = torch.from_numpy(gather_windows(self, ix + 1, block_size))
+        return x, y
+
+
+class TokenShards:
+    """Read-only view over the shards written by `write_token_shards`."""
+
+    def __init__(self, data_dir: str):
+        with open(os.path.join(data_dir, META_FILE), 'r') as f:
+            self.meta = json.load(f)
+
+        dtype = np.dtype(self.meta["dtype"])
+        self.shards = [
+            np.memmap(os.path.join(data_dir, shard["file"]), dtype=dtype, mode='r', shape=(shard["tokens"], ))
+            for shard in self.meta["shards"]
+        ]
+        self.all = TokenSplit(self.shards)
+
+    @property
+    def vocab_size(self) -> int:
+        return self.meta["vocab_size"]
+
+    def __len__(self) -> int:
+        return len(self.all)
+
+    def split(self, train_fraction: float = 0.9) -> tuple:
+        """Split into (train, val) at a token index; both are views, nothing is copied."""
+        n = int(train_fraction * len(self))
+        train, val = [], []
+        for shard, start in zip(self.all.segments, self.all.starts):
+            cut = min(max(n - start, 0), len(shard))
+            train.append(shard[:cut])
+            val.append(shard[cut:])
+        return TokenSplit(train), TokenSplit(val)
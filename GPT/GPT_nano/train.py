@@ -0,0 +1,239 @@
+"""
+CPU-friendly training entry point for GPT_nano.
+
+Reads the token shards written by `token_data.write_token_shards`, samples
+batches on a background thread, accumulates gradients over several micro
+batches and saves checkpoints without blocking the loop. Every log interval it
+prints tokens/sec and where the step time went (data wait, forward, backward,
+optimizer).
+
+Usage:
+    python train.py --data data/tokens --threads 8 --batch-size 32 --block-size 64 --grad-accum 4
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_sampler import BatchSampler
+from model import BigramLanguageModel
+from token_data import TokenShards
+
+
+def configure_threads(threads: int = None, interop_threads: int = None) -> int:
+    """Use every core for intra-op parallelism unless told otherwise; returns the thread count in use."""
+    threads = threads or os.cpu_count() or 1
+    torch.set_num_threads(threads)
+    if interop_threads:
+        # may only be set once, before any parallel work has run
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            pass
+    return torch.get_num_threads()
+
+
+class AsyncCheckpointer:
+    """
+    Saves checkpoints on a background thread.
+
+    The state is copied to CPU tensors on the calling thread, which is fast, and
+    serialized in the background, which is slow. Files are written to a
+    temporary name and renamed, so a crash never leaves a half-written checkpoint.
+    """
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self._thread = None
+        os.makedirs(out_dir, exist_ok=True)
+
+    @staticmethod
+    def _snapshot(state):
+        if torch.is_tensor(state):
+            return state.detach().to('cpu', copy=True)
+        if isinstance(state, dict):
+            return {key: AsyncCheckpointer._snapshot(value) for key, value in state.items()}
+        if isinstance(state, (list, tuple)):
+            return type(state)(AsyncCheckpointer._snapshot(value) for value in state)
+        return state
+
+    def _write(self, state: dict, path: str):
+        tmp_path = path + ".tmp"
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, path)
+
+    def save(self, state: dict, name: str = "ckpt.pt") -> float:
+        """Start saving `state`; returns the seconds the training loop was blocked."""
+        start = time.perf_counter()
+        self.wait()
+        snapshot = self._snapshot(state)
+        path = os.path.join(self.out_dir, name)
+        self._thread = threading.Thread(target=self._write, args=(snapshot, path), name="checkpoint", daemon=True)
+        self._thread.start()
+        return time.perf_counter() - start
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class StepTimer:
+    """Accumulates wall time per phase of a training step between log lines."""
+
+    PHASES = ("data", "forward", "backward", "optimizer", "checkpoint")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.totals = dict.fromkeys(self.PHASES, 0.0)
+        self.steps = 0
+        self.tokens = 0
+        self.start = time.perf_counter()
+
+    def add(self, phase: str, seconds: float):
+        self.totals[phase] += seconds
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.start
+        steps = max(self.steps, 1)
+        report = {
+            "tokens_per_s": round(self.tokens / elapsed, 1) if elapsed else 0.0,
+            "step_ms": round(1000 * elapsed / steps, 2),
+        }
+        for phase, seconds in self.totals.items():
+            report[f"{phase}_ms"] = round(1000 * seconds / steps, 2)
+        return report
+
+
+@torch.no_grad()
+def estimate_loss(model, samplers: dict, eval_iters: int) -> dict:
+    model.eval()
+    losses = {}
+    for split, sampler in samplers.items():
+        total = 0.0
+        for _ in range(eval_iters):
+            xb, yb = next(sampler)
+            _, loss = model(xb, yb)
+            total += loss.item()
+        losses[split] = total / eval_iters
+    model.train()
+    return losses
+
+
+def step_seed(seed: int, step: int) -> int:
+    """Independent sampler seed for a run (re)started at `step`."""
+    return int(np.random.SeedSequence([seed, step]).generate_state(1)[0])
+
+
+def train(args) -> dict:
+    threads = configure_threads(args.threads, args.interop_threads)
+    torch.manual_seed(args.seed)
+
+    data = TokenShards(args.data)
+    train_data, val_data = data.split(args.train_fraction)
+    model = BigramLanguageModel(data.vocab_size)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr)
+
+    step = 0
+    if args.resume:
+        checkpoint = torch.load(args.resume, map_location='cpu')
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        step = checkpoint["step"]
+        print(f"Resumed from {args.resume} at step {step}")
+        # fresh dropout masks after a resume, not the ones of the first run's opening steps
+        torch.manual_seed(step_seed(args.seed, step))
+
+    tokens_per_step = args.batch_size * args.block_size * args.grad_accum
+    print(f"threads={threads} | tokens/step={tokens_per_step} | train tokens={len(train_data)} | val tokens={len(val_data)}")
+
+    checkpointer = AsyncCheckpointer(args.out_dir)
+    timer = StepTimer()
+    log = open(args.log_file, 'a') if args.log_file else None
+
+    # the samplers are seeded with the step too, so a resumed run continues with
+    # new batches instead of replaying the ones it was trained on before the checkpoint
+    train_sampler = BatchSampler(train_data, args.batch_size, args.block_size, args.prefetch, seed=step_seed(args.seed, step))
+    eval_samplers = {
+        'train': BatchSampler(train_data, args.batch_size, args.block_size, prefetch=0, seed=step_seed(args.seed + 1, step)),
+        'val': BatchSampler(val_data, args.batch_size, args.block_size, prefetch=0, seed=step_seed(args.seed + 2, step)),
+    }
+
+    losses = {}
+    with train_sampler:
+        while step < args.max_steps:
+            optimizer.zero_grad(set_to_none=True)
+            for _ in range(args.grad_accum):
+                t0 = time.perf_counter()
+                xb, yb = next(train_sampler)
+                t1 = time.perf_counter()
+                _, loss = model(xb, yb)
+                t2 = time.perf_counter()
+                (loss / args.grad_accum).backward()
+                t3 = time.perf_counter()
+                timer.add("data", t1 - t0)
+                timer.add("forward", t2 - t1)
+                timer.add("backward", t3 - t2)
+
+            t0 = time.perf_counter()
+            optimizer.step()
+            timer.add("optimizer", time.perf_counter() - t0)
+            step += 1
+            timer.steps += 1
+            timer.tokens += tokens_per_step
+
+            if step % args.checkpoint_interval == 0 or step == args.max_steps:
+                state = {"model": model.state_dict(), "optimizer": optimizer.state_dict(), "step": step,
+                         "config": vars(args)}
+                timer.add("checkpoint", checkpointer.save(state))
+
+            if step % args.log_interval == 0 or step == args.max_steps:
+                report = {"step": step, "loss": round(loss.item(), 4), **timer.report()}
+                if args.eval_iters:
+                    losses = estimate_loss(model, eval_samplers, args.eval_iters)
+                    report.update({f"{split}_loss": round(value, 4) for split, value in losses.items()})
+                print(" | ".join(f"{key}={value}" for key, value in report.items()))
+                if log:
+                    log.write(json.dumps(report) + "\n")
+                    log.flush()
+                timer.reset()
+
+    checkpointer.wait()
+    if log:
+        log.close()
+    return losses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train GPT_nano on CPU")
+    parser.add_argument("--data", default="data/tokens", help="directory written by write_token_shards")
+    parser.add_argument("--out-dir", default="checkpoints")
+    parser.add_argument("--resume", help="checkpoint to continue from")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op threads, defaults to all cores")
+    parser.add_argument("--interop-threads", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--block-size", type=int, default=8)
+    parser.add_argument("--grad-accum", type=int, default=1, help="micro batches per optimizer step")
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--max-steps", type=int, default=10_000)
+    parser.add_argument("--train-fraction", type=float, default=0.9)
+    parser.add_argument("--prefetch", type=int, default=4, help="batches sampled ahead on a background thread")
+    parser.add_argument("--log-interval", type=int, default=100)
+    parser.add_argument("--eval-iters", type=int, default=20, help="batches per split for the loss estimate, 0 to skip")
+    parser.add_argument("--checkpoint-interval", type=int, default=1000)
+    parser.add_argument("--log-file", help="append one JSON line of telemetry per log interval")
+    parser.add_argument("--seed", type=int, default=1337)
+    train(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,26 @@
-import subprocess
-import json
 import time
 
-def run_math_client():
-    # Start the math_server process
-    process = subprocess.Popen(
-        ["python", "servers/math_server/main.py"],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
+try:
+    from .pool import StdioServerPool
+except ImportError:
+    from pool import StdioServerPool
 
-    def send_request(request_json):
-        process = subprocess.Popen(
-            ["python", "servers/math_server/main.py"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,          # ensures input/output are strings not bytes
-            bufsize=1           # line-buffered
-        )
+def run_math_client(pool_size=2):
+    # long-lived math_server processes, initialized once and reused for every call
+    pool = StdioServerPool(size=pool_size)
 
+    def send_request(request_json):
         try:
-            # Send the JSON-RPC request
-            process.stdin.write(json.dumps(request_json) + "\n")
-            process.stdin.flush()
-
-            # Read the server's response
-            response_line = process.stdout.readline()
-            return json.loads(response_line)
+            return pool.send_request(request_json)
 
         except Exception as e:
             return {"error": str(e)}
 
-        finally:
-            process.terminate()
-
     print("Initializing math_server...")
-    init_request = {
-        "jsonrpc": "2.0",
-        "id": "init",
-        "method": "initialize",
-        "params": {
-            "protocolVersion": "1.0",
-            "capabilities": {},
-            "clientInfo": {
-                "name": "math_client",
-                "version": "1.0"
-            }
-        }
-    }
-    print(send_request(init_request))
+    start = time.perf_counter()
+    pool.start()
+    print(f"{pool_size} server(s) ready in {time.perf_counter() - start:.2f}s")
+    print(pool.workers[0].server_info)
 
     print("Calling add...")
     add_request = {
@@ -97,7 +66,26 @@ def run_math_client():
     }
     print(send_request(area_request))
 
-    process.terminate()
+    print("Calling area_of_circle for 1000 radii in one batch...")
+    batch_request = [
+        {
+            "jsonrpc": "2.0",
+            "id": f"area-{radius}",
+            "method": "tools/call",
+            "params": {
+                "name": "area_of_circle",
+                "arguments": {
+                    "radius": radius
+                }
+            }
+        }
+        for radius in range(1000)
+    ]
+    start = time.perf_counter()
+    batch_response = send_request(batch_request)
+    print(f"{len(batch_response)} results in {time.perf_counter() - start:.2f}s, last: {batch_response[-1]}")
+
+    pool.close()
 
 if __name__ == "__main__":
     run_math_client()
@@ -0,0 +1,296 @@
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MATH_SERVER = os.path.join(PROJECT_ROOT, "servers", "math_server", "main.py")
+sys.path.append(PROJECT_ROOT)
+
+from shared.stdio_transport import FrameTooLarge, StdioTransport
+
+PROTOCOL_VERSION = "2025-06-18"
+
+
+class ServerWorker:
+    """
+    One long-lived MCP server subprocess spoken to over stdio.
+
+    Requests are written as JSON lines and matched to responses by JSON-RPC id,
+    so several threads can have calls in flight on the same process. A reader
+    thread owns the transport's read side; text that is not JSON (banners,
+    tool debug prints) and stderr end up in `transport.logs` / `transport.stderr`.
+    """
+
+    def __init__(self, command: list, client_name: str = "math_client", cwd: str = PROJECT_ROOT):
+        self.command = command
+        self.client_name = client_name
+        self.cwd = cwd
+        self.process = None
+        self.transport = None
+        self.server_info = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        # guards _pending against the reader's EOF handoff
+        self._lock = threading.Lock()
+        self._exited = False
+
+    def start(self, timeout: float = 30):
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.cwd
+        )
+        self.transport = StdioTransport(self.process)
+        threading.Thread(target=self._read_loop, args=(self.transport, ), daemon=True).start()
+
+        # handshake once per process, every later call reuses the session
+        response = self.request({
+            "jsonrpc": "2.0",
+            "method": "initialize",
+            "params": {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": {"name": self.client_name, "version": "1.0"}
+            }
+        }, timeout=timeout)
+        if "error" in response:
+            raise ConnectionError(f"initialize failed: {response['error']}")
+        self.server_info = response["result"]
+        self.transport.send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        return self
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def _register(self, message: dict) -> tuple:
+        request_id = next(self._ids)
+        future = Future()
+        future.original_id = message.get("id")
+        future.request_id = request_id
+        with self._lock:
+            if self._exited:
+                future.set_exception(ConnectionError("server process exited"))
+            else:
+                self._pending[request_id] = future
+        return {**message, "id": request_id}, future
+
+    def _wait(self, future: Future, timeout: float) -> dict:
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # nobody will collect a late answer, do not keep the slot forever
+            self._pending.pop(future.request_id, None)
+            future.cancel()
+            raise
+
+    def _send(self, payload, requests: list):
+        try:
+            self.transport.send(payload)
+        except (BrokenPipeError, OSError, ValueError) as e:
+            for request in requests:
+                future = self._pending.pop(request["id"], None)
+                if future is not None:
+                    future.set_exception(ConnectionError(f"server process is gone: {e}"))
+
+    def submit(self, message: dict) -> Future:
+        """Send a request under a fresh id; the future resolves to the response with the caller's id restored."""
+        message, future = self._register(message)
+        self._send(message, [message])
+        return future
+
+    def submit_batch(self, messages: list) -> list:
+        """Send requests as one JSON-RPC batch array; returns one future per message that has an id."""
+        payload, requests, futures = [], [], []
+        for message in messages:
+            # anything but an object goes out untouched, the server answers it with an error
+            if isinstance(message, dict) and "id" in message:
+                message, future = self._register(message)
+                requests.append(message)
+                futures.append(future)
+            payload.append(message)
+        self._send(payload, requests)
+        return futures
+
+    def request(self, message: dict, timeout: float = None) -> dict:
+        return self._wait(self.submit(message), timeout)
+
+    def request_batch(self, messages: list, timeout: float = None) -> list:
+        futures = self.submit_batch(messages)
+        try:
+            return [self._wait(future, timeout) for future in futures]
+        except FutureTimeoutError:
+            for future in futures:
+                self._pending.pop(future.request_id, None)
+                future.cancel()
+            raise
+
+    def _read_loop(self, transport: StdioTransport):
+        while True:
+            try:
+                payload = transport.read_message()
+            except FrameTooLarge:
+                # the oversized line is dropped, framing resumes at the next newline
+                continue
+            except (EOFError, OSError):
+                break
+
+            # a batch answer is an array of ordinary responses
+            for response in payload if isinstance(payload, list) else [payload]:
+                # only our own integer ids can match; a list / dict id is not even hashable
+                if not isinstance(response, dict) or type(response.get("id")) is not int:
+                    continue
+                future = self._pending.pop(response["id"], None)
+                if future is None:
+                    # server notifications and responses nobody waits for any more
+                    continue
+                response["id"] = future.original_id
+                if future.set_running_or_notify_cancel():
+                    future.set_result(response)
+
+        # EOF: the process died, nothing pending will ever be answered
+        transport.close()
+        with self._lock:
+            self._exited = True
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if future.set_running_or_notify_cancel():
+                future.set_exception(ConnectionError("server process exited"))
+
+    def close(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class StdioServerPool:
+    """
+    Keeps `size` MCP server processes running and spreads requests over them.
+
+    Each request goes to the live worker with the fewest calls in flight. Dead
+    workers are restarted in the background while the others keep serving, and
+    a call that was lost with a dying process is retried up to `retries` times.
+
+    Example:
+        with StdioServerPool(size=2) as pool:
+            result = pool.call_tool("add", {"a": 5, "b": 7})
+    """
+
+    def __init__(self, script: str = MATH_SERVER, size: int = 2, timeout: float = 30, retries: int = 1,
+                 client_name: str = "math_client", cache=None):
+        self.command = [sys.executable, script]
+        # optional client-side shared.tool_cache.ToolCache, skips the round trip for cacheable tools
+        self.cache = cache
+        self.size = size
+        self.timeout = timeout
+        self.retries = retries
+        self.client_name = client_name
+        self.workers = []
+        self.restarts = 0
+        self._restarting = set()
+        self._lock = threading.Lock()
+
+    def _spawn(self) -> ServerWorker:
+        return ServerWorker(self.command, client_name=self.client_name).start(timeout=self.timeout)
+
+    def start(self):
+        with self._lock:
+            missing = self.size - len(self.workers)
+            if missing > 0:
+                # interpreter start-up dominates, so bring the processes up side by side
+                with ThreadPoolExecutor(max_workers=missing) as executor:
+                    self.workers.extend(executor.map(lambda _: self._spawn(), range(missing)))
+        return self
+
+    def _restart(self, slot: int):
+        try:
+            worker = self._spawn()
+        except Exception as e:
+            print(f"[pool] restarting worker {slot} failed: {e}")
+            worker = None
+        with self._lock:
+            self._restarting.discard(slot)
+            if worker is None:
+                return
+            old, self.workers[slot] = self.workers[slot], worker
+            self.restarts += 1
+        old.close()
+
+    def _pick(self) -> ServerWorker:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                if not self.workers:
+                    raise RuntimeError("pool is not started")
+                for slot, worker in enumerate(self.workers):
+                    if not worker.alive and slot not in self._restarting:
+                        self._restarting.add(slot)
+                        threading.Thread(target=self._restart, args=(slot, ), daemon=True).start()
+                alive = [worker for worker in self.workers if worker.alive]
+            if alive:
+                return min(alive, key=lambda worker: worker.in_flight)
+
+            # every process is down, wait for a replacement instead of failing the call
+            if time.monotonic() > deadline:
+                raise ConnectionError("no math server process could be started")
+            time.sleep(0.05)
+
+    def send_request(self, request_json):
+        """
+        Send one request, or a list of requests as a single JSON-RPC batch.
+
+        For a list the responses come back in request order; notifications in
+        the batch have no response and are left out.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                if isinstance(request_json, list):
+                    return self._pick().request_batch(request_json, timeout=self.timeout)
+                return self._pick().request(request_json, timeout=self.timeout)
+            except ConnectionError:
+                if attempt == self.retries:
+                    raise
+
+    def call_tool(self, name: str, arguments: dict) -> dict:
+        if self.cache is not None and self.cache.cacheable(name):
+            hit, result = self.cache.get(name, arguments)
+            if hit:
+                return result
+
+        response = self.send_request({
+            "jsonrpc": "2.0",
+            "id": name,
+            "method": "tools/call",
+            "params": {"name": name, "arguments": arguments}
+        })
+        if "error" in response:
+            raise RuntimeError(response["error"].get("message", response["error"]))
+        if self.cache is not None and not response["result"].get("isError"):
+            self.cache.put(name, arguments, response["result"])
+        return response["result"]
+
+    def close(self):
+        with self._lock:
+            for worker in self.workers:
+                worker.close()
+            self.workers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
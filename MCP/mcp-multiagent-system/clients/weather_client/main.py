@@ -1,21 +1,65 @@
 import requests
 import json
+import os
+import sys
+import time
 import uuid
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ChunkedEncodingError
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from shared.sse import iter_sse_json
+
+try:
+    from .pipeline import PipelinedConnection
+except ImportError:
+    from pipeline import PipelinedConnection
+
 MCP_ENDPOINT = "http://localhost:8000/mcp/"
 
-# Use a single requests.Session object to persist headers and cookies
+# Use a single requests.Session object to persist headers and cookies.
+# Every request, initialize included, goes over its one keep-alive connection.
 session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
 session.headers.update({
     "Content-Type": "application/json",
     "Accept": "application/json, text/event-stream"
 })
 
+def stream_jsonrpc(payload):
+    """
+    Posts a request (or a batch) on the shared session and yields JSON-RPC
+    messages as soon as their SSE events arrive, not once the body is complete.
+    The `mcp-session-id` the server hands out is kept on the session.
+    """
+    print(f"\nSending JSON-RPC request to {MCP_ENDPOINT} using a shared session.")
+    with session.post(MCP_ENDPOINT, data=json.dumps(payload), stream=True) as response:
+        response.raise_for_status()
+        session_id = response.headers.get("mcp-session-id")
+        if session_id:
+            session.headers["mcp-session-id"] = session_id
+
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            yield from iter_sse_json(response.iter_content(chunk_size=None))
+        elif response.content:
+            body = response.json()
+            yield from body if isinstance(body, list) else [body]
+
 def send_jsonrpc_request_with_session(payload):
+    """Sends a request and returns its response message, or the response array of a batch."""
     try:
-        print(f"\nSending JSON-RPC request to {MCP_ENDPOINT} using a shared session.")
-        response = session.post(MCP_ENDPOINT, data=json.dumps(payload))
+        responses = []
+        for message in stream_jsonrpc(payload):
+            if isinstance(message, list):
+                responses.extend(message)
+            elif "id" in message:
+                responses.append(message)
+            else:
+                print(f"Received JSON-RPC notification: {json.dumps(message)}")
+
+        response = responses if isinstance(payload, list) else next(
+            (message for message in responses if message.get("id") == payload.get("id")), None)
         return {
             'status': True,
             'response': response,
@@ -27,7 +71,18 @@ def send_jsonrpc_request_with_session(payload):
             'error': str(e)
         }
 
-def run_weather_client():
+def tool_call(name, arguments):
+    return {
+        "jsonrpc": "2.0",
+        "id": str(uuid.uuid4()),
+        "method": "tools/call",
+        "params": {
+            "name": name,
+            "arguments": arguments
+        }
+    }
+
+def run_weather_client(pipeline=False):
     print("→ Initializing weather server...")
 
     init_request = {
@@ -43,38 +98,24 @@ def run_weather_client():
             }
         }
     }
-    
-    session_id = None
+
     try:
-        with requests.post(MCP_ENDPOINT, data=json.dumps(init_request), headers=session.headers, stream=True) as response:
-            print("→ Initializing connection established.")
-            print("→ Response status:", response.status_code)
-            
-            session_id = response.headers.get('mcp-session-id')
-            if session_id:
-                print(f"✅ Extracted session ID from headers: {session_id}")
-            else:
-                print("❌ Failed to extract session ID from response headers.")
-                return
-
-            session.headers.update({'mcp-session-id': session_id})
-            
-            is_initialized = False
-            for line in response.iter_lines(decode_unicode=True):
-                if line.startswith('data:'):
-                    try:
-                        json_data = json.loads(line[5:].strip())
-                        print(f"Received JSON-RPC message: {json.dumps(json_data)}")
-                        if 'result' in json_data and 'capabilities' in json_data['result']:
-                            print("✅ Received initialization result. Server is ready.")
-                            is_initialized = True
-                            break
-                    except json.JSONDecodeError:
-                        pass
-            
-            if not is_initialized:
-                print("❌ Initialization failed. Server did not send a completion message.")
-                return
+        is_initialized = False
+        for json_data in stream_jsonrpc(init_request):
+            print(f"Received JSON-RPC message: {json.dumps(json_data)}")
+            if 'result' in json_data and 'capabilities' in json_data['result']:
+                print("✅ Received initialization result. Server is ready.")
+                is_initialized = True
+
+        if 'mcp-session-id' in session.headers:
+            print(f"✅ Extracted session ID from headers: {session.headers['mcp-session-id']}")
+        else:
+            print("❌ Failed to extract session ID from response headers.")
+            return
+
+        if not is_initialized:
+            print("❌ Initialization failed. Server did not send a completion message.")
+            return
 
     except ChunkedEncodingError as e:
         print(f"An error occurred while reading the stream: {e}")
@@ -83,47 +124,41 @@ def run_weather_client():
         print(f"An unexpected error occurred: {e}")
         return
 
+    # the session only accepts requests once the client confirms initialization
+    send_jsonrpc_request_with_session({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
     # Now that initialization is complete, we can send subsequent requests.
     print("\n\n\n→ Calling temperature...")
-    temp_request = {
-        "jsonrpc": "2.0",
-        "id": str(uuid.uuid4()),
-        "method": "tools/call",
-        "params": {
-            "key": "temperature",
-            "arguments": {
-                "location": "London"
-            }
-        }
-    }
-    temp_response = send_jsonrpc_request_with_session(temp_request)
+    temp_response = send_jsonrpc_request_with_session(tool_call("temperature", {"location": "London"}))
     if temp_response['status']:
-        print("→ Response status:", temp_response['response'].status_code)
-        print("→ Response headers:", temp_response['response'].headers)
-        print("→ Raw body:", temp_response['response'].text)
+        print("→ Response:", temp_response['response'])
     else:
         print("Error calling temperature tool:", temp_response['error'])
 
     print("\n\n\n→ Calling rain...")
-    rain_request = {
-        "jsonrpc": "2.0",
-        "id": str(uuid.uuid4()),
-        "method": "tools/call",
-        "params": {
-            "key": "rain",
-            "arguments": {
-                "location": "Tokyo"
-            }
-        }
-    }
-    
-    rain_response = send_jsonrpc_request_with_session(rain_request)
+    rain_response = send_jsonrpc_request_with_session(tool_call("rain", {"location": "Tokyo"}))
     if rain_response['status']:
-        print("→ Response status:", rain_response['response'].status_code)
-        print("→ Response headers:", rain_response['response'].headers)
-        print("→ Raw body:", rain_response['response'].text)
+        print("→ Response:", rain_response['response'])
     else:
-        print("Error calling temperature tool:", rain_response['error'])
+        print("Error calling rain tool:", rain_response['error'])
+
+    cities = ["New York", "London", "Tokyo", "Sydney", "Paris"]
+
+    print("\n\n\n→ Calling temperature for every city in one batch...")
+    batch_response = send_jsonrpc_request_with_session([tool_call("temperature", {"location": city}) for city in cities])
+    if batch_response['status']:
+        for result in batch_response['response']:
+            print("→", result)
+    else:
+        print("Error calling temperature tool:", batch_response['error'])
+
+    if pipeline:
+        # every call is written before the first answer is read, one round trip for all of them
+        print("\n\n\n→ Calling rain for every city, pipelined on one connection...")
+        start = time.perf_counter()
+        with PipelinedConnection(MCP_ENDPOINT, session.headers) as connection:
+            for index, message in connection.post_all([tool_call("rain", {"location": city}) for city in cities]):
+                print(f"→ [{(time.perf_counter() - start) * 1000:.1f} ms] {cities[index]}:", message.get("result", message))
 
 if __name__ == "__main__":
-    run_weather_client()
\ No newline at end of file
+    run_weather_client(pipeline="--pipeline" in sys.argv)
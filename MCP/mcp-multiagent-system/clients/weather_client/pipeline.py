@@ -0,0 +1,127 @@
+import json
+import os
+import socket
+import sys
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from shared.sse import SSEDecoder
+
+
+class PipelinedConnection:
+    """
+    One plain HTTP/1.1 keep-alive connection with several POSTs in flight.
+
+    `requests` waits for each response before it sends the next request. Here
+    every request is written back to back and the responses are read in the
+    same order (HTTP/1.1 pipelining), so a run of tool calls costs one round
+    trip instead of one each. Messages are yielded as their SSE events arrive.
+
+    Example:
+        with PipelinedConnection(MCP_ENDPOINT, session.headers) as connection:
+            for index, message in connection.post_all(requests):
+                print(index, message)
+    """
+
+    def __init__(self, url: str, headers: dict = None, timeout: float = 30):
+        parts = urlsplit(url)
+        if parts.scheme != "http":
+            raise ValueError("pipelining is only supported over plain http")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path or "/"
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.sock = None
+        self._file = None
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self.sock.makefile("rb")
+        return self
+
+    def _encode(self, payload) -> bytes:
+        body = json.dumps(payload).encode("utf-8")
+        lines = [f"POST {self.path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{key}: {value}" for key, value in self.headers.items() if key.lower() != "content-length")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+    def post_all(self, payloads: list):
+        """
+        Send every payload at once, then yield (index, message) for each JSON-RPC
+        message in the responses, in request order.
+        """
+        if self.sock is None:
+            self.connect()
+        self.sock.sendall(b"".join(self._encode(payload) for payload in payloads))
+
+        for index in range(len(payloads)):
+            status, headers = self._read_head()
+            session_id = headers.get("mcp-session-id")
+            if session_id:
+                self.headers["mcp-session-id"] = session_id
+
+            if headers.get("content-type", "").startswith("text/event-stream"):
+                decoder = SSEDecoder()
+                for chunk in self._read_body(headers):
+                    for event in decoder.feed(chunk):
+                        if event.data:
+                            yield index, json.loads(event.data)
+                for event in decoder.flush():
+                    if event.data:
+                        yield index, json.loads(event.data)
+            else:
+                body = b"".join(self._read_body(headers))
+                if status >= 400 and not body:
+                    raise ConnectionError(f"HTTP {status} for request {index}")
+                if body:
+                    yield index, json.loads(body)
+
+            if headers.get("connection", "").lower() == "close" and index < len(payloads) - 1:
+                self.close()
+                raise ConnectionError(f"server closed the connection after {index + 1} of {len(payloads)} responses")
+
+    def _read_head(self) -> tuple:
+        status_line = self._file.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split(b" ", 2)[1])
+        headers = {}
+        while True:
+            line = self._file.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return status, headers
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+    def _read_body(self, headers: dict):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int(self._file.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    # optional trailers, then the blank line that ends the body
+                    while self._file.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                yield self._file.read(size)
+                self._file.readline()
+        else:
+            length = int(headers.get("content-length", 0))
+            if length:
+                yield self._file.read(length)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,31 +1,72 @@
-from langgraph.graph import StateGraph
+from typing import Annotated, TypedDict
+from langgraph.graph import StateGraph, END
+from langgraph.types import Send
 from fastmcp import FastMCP
 import json
 
-class HostState:
-    def __init__(self):
-        self.results = []
+WEATHER_TOOLS = {"temperature", "rain"}
+
+def merge_results(existing: list, new: list) -> list:
+    # fan-out branches finish in any order; results that carry their plan index are kept in plan order
+    combined = existing + new
+    ordered = sorted((r for r in combined if "index" in r), key=lambda r: r["index"])
+    return [r for r in combined if "index" not in r] + ordered
+
+class HostState(TypedDict, total=False):
+    results: Annotated[list, merge_results]
+    # independent tool calls ({"name": ..., "arguments": ...}) for fan-out mode
+    plan: list
+
+def client_for(name: str) -> str:
+    return "weather" if name in WEATHER_TOOLS else "math"
 
 def decide_branch(state: HostState) -> str:
-    last_result = state.results[-1]
+    last_result = state["results"][-1]
     if "temperature" in last_result["name"] or "rain" in last_result["name"]:
         return "weather"
     return "math"
 
 def invoke_math_client(state: HostState, mcp) -> HostState:
-    result = mcp.invoke_tool("math_client", name=state.results[-1]["name"], arguments=state.results[-1]["arguments"])
-    state.results.append(result)
-    return state
+    result = mcp.invoke_tool("math_client", name=state["results"][-1]["name"], arguments=state["results"][-1]["arguments"])
+    return {"results": [result]}
 
 def invoke_weather_client(state: HostState, mcp) -> HostState:
-    result = mcp.invoke_tool("weather_client", name=state.results[-1]["name"], arguments=state.results[-1]["arguments"])
-    state.results.append(result)
-    return state
+    result = mcp.invoke_tool("weather_client", name=state["results"][-1]["name"], arguments=state["results"][-1]["arguments"])
+    return {"results": [result]}
+
+def fan_out(state: HostState) -> list:
+    # one Send per planned call; LangGraph runs all of them in the same step, concurrently
+    return [
+        Send(client_for(call["name"]), {"index": index, "call": call})
+        for index, call in enumerate(state["plan"])
+    ]
 
-def build_langgraph(mcp: FastMCP):
+def invoke_client(task: dict, mcp, client: str) -> HostState:
+    call = task["call"]
+    entry = {"index": task["index"], "name": call["name"], "arguments": call["arguments"]}
+    try:
+        entry["result"] = mcp.invoke_tool(client, name=call["name"], arguments=call["arguments"])
+    except Exception as e:
+        # one failing call must not take down its siblings
+        entry["error"] = str(e)
+    return {"results": [entry]}
+
+def build_langgraph(mcp: FastMCP, fan_out_mode: bool = False):
     builder = StateGraph(HostState)
-    
-    builder.add_node("router", lambda state: decide_branch(state))
+
+    if fan_out_mode:
+        # plan -> every call dispatched at once -> results merged in plan order
+        builder.add_node("planner", lambda state: {})
+        builder.add_node("math", lambda task: invoke_client(task, mcp, "math_client"))
+        builder.add_node("weather", lambda task: invoke_client(task, mcp, "weather_client"))
+
+        builder.set_entry_point("planner")
+        builder.add_conditional_edges("planner", fan_out, ["math", "weather"])
+        builder.add_edge("math", END)
+        builder.add_edge("weather", END)
+        return builder.compile()
+
+    builder.add_node("router", lambda state: {})
     builder.add_node("math", lambda state: invoke_math_client(state, mcp))
     builder.add_node("weather", lambda state: invoke_weather_client(state, mcp))
 
@@ -19,8 +19,8 @@ if __name__ == "__main__":
     for client in config["clients"]:
         mcp.include(path=client["path"], name=client["name"])
 
-    # Build orchestration graph
-    graph = build_langgraph(mcp)
+    # Build orchestration graph; with "fan_out" the graph takes a plan of independent calls and runs them concurrently
+    graph = build_langgraph(mcp, fan_out_mode=config.get("fan_out", False))
     mcp.include_graph(graph)
 
     mcp.run(transport="stdio")
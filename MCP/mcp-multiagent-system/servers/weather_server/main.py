@@ -1,8 +1,15 @@
 from fastmcp import FastMCP
+from starlette.middleware import Middleware
 import os
+import sys
 import importlib.util
 import json
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.tool_cache import ToolCache, CachingRegistrar, register_cache_resource
+from shared.tool_manifest import register_from_manifest
+from shared.jsonrpc_batch import BatchHTTPMiddleware
+
 def get_agent_details(config_path: str) -> dict:
     with open(config_path, "r") as f:
         config = json.load(f)
@@ -24,5 +31,11 @@ if __name__ == "__main__":
     config = get_agent_details(config_path)
     AGENT_NAME = config["agent"]["name"]
     mcp = FastMCP(name=AGENT_NAME)
-    load_all_tools(mcp)
-    mcp.run(transport="http", host="0.0.0.0", port=8000, path="/mcp/")
+    # pure tools are memoized, time-varying ones kept for a TTL; counters at cache://stats
+    cache = ToolCache.from_config(config.get("cache", {}))
+    # tools are registered from tool_manifest.json and imported on first call; without a manifest load them all now
+    if not register_from_manifest(mcp, os.path.dirname(os.path.abspath(__file__)), wrap=cache.wrap):
+        load_all_tools(CachingRegistrar(mcp, cache))
+    register_cache_resource(mcp, cache)
+    mcp.run(transport="http", host="0.0.0.0", port=8000, path="/mcp/",
+            middleware=[Middleware(BatchHTTPMiddleware)])
@@ -0,0 +1,273 @@
+import abc
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import sys
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.sse import aiter_sse_json
+
+PROTOCOL_VERSION = "2025-06-18"
+
+
+class MCPError(Exception):
+    """A JSON-RPC error response from an MCP server."""
+
+    def __init__(self, error: dict):
+        super().__init__(error.get("message", str(error)))
+        self.code = error.get("code")
+        self.data = error.get("data")
+
+
+class AsyncMCPClient(abc.ABC):
+    """
+    Transport independent asyncio MCP client.
+
+    Every request gets its own JSON-RPC id and a future; responses are matched
+    back by id, so any number of `tools/call` requests can be in flight on one
+    connection. `max_in_flight` bounds how many are outstanding at once: extra
+    callers wait for a slot instead of flooding the server.
+
+    Subclasses implement `_open`, `_send` and `_close`, and call `_dispatch`
+    for every message the server sends.
+
+    Example:
+        async with StdioMCPClient("servers/math_server/main.py") as client:
+            results = await asyncio.gather(*(client.call_tool("add", {"a": i, "b": 1}) for i in range(50)))
+    """
+
+    def __init__(self, client_name: str = "async_client", timeout: float = 30, max_in_flight: int = 64,
+                 startup_timeout: float = 30):
+        self.client_name = client_name
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.server_info = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    async def connect(self):
+        await self._open()
+        self.server_info = await self.request("initialize", {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": self.client_name, "version": "1.0"}
+        }, timeout=self.startup_timeout)
+        await self.notify("notifications/initialized")
+        return self
+
+    async def request(self, method: str, params: dict = None, timeout: float = None) -> dict:
+        """Send one request and wait for its result; raises `MCPError` on an error response."""
+        async with self._slots:
+            request_id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+
+            message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+            if params is not None:
+                message["params"] = params
+
+            try:
+                await self._send(message)
+                response = await asyncio.wait_for(future, timeout or self.timeout)
+            except asyncio.TimeoutError:
+                # best effort, the connection may be what timed out
+                with contextlib.suppress(Exception):
+                    await self.notify("notifications/cancelled", {"requestId": request_id, "reason": "timeout"})
+                raise
+            finally:
+                self._pending.pop(request_id, None)
+
+        if "error" in response:
+            raise MCPError(response["error"])
+        return response["result"]
+
+    async def notify(self, method: str, params: dict = None):
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        await self._send(message)
+
+    async def call_tool(self, name: str, arguments: dict, timeout: float = None) -> dict:
+        return await self.request("tools/call", {"name": name, "arguments": arguments}, timeout=timeout)
+
+    async def list_tools(self) -> list:
+        return (await self.request("tools/list"))["tools"]
+
+    def _dispatch(self, message):
+        # a batch answer is an array of ordinary responses; scalars, non-objects
+        # and ids we never issued (possibly unhashable) are ignored
+        for response in message if isinstance(message, list) else [message]:
+            if not isinstance(response, dict) or type(response.get("id")) is not int:
+                continue
+            future = self._pending.get(response["id"])
+            if future is not None and not future.done():
+                future.set_result(response)
+
+    def _fail_pending(self, error: Exception):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self):
+        self._fail_pending(ConnectionError("client closed"))
+        await self._close()
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @abc.abstractmethod
+    async def _open(self):
+        ...
+
+    @abc.abstractmethod
+    async def _send(self, message: dict):
+        ...
+
+    @abc.abstractmethod
+    async def _close(self):
+        ...
+
+
+class StdioMCPClient(AsyncMCPClient):
+    """MCP over a server subprocess's stdin / stdout, one JSON message per line."""
+
+    def __init__(self, script: str, cwd: str = None, max_line: int = 2 ** 24, **kwargs):
+        super().__init__(**kwargs)
+        self.command = [sys.executable, script]
+        self.cwd = cwd
+        self.max_line = max_line
+        self.process = None
+        self._reader = None
+        self._write_lock = asyncio.Lock()
+
+    async def _open(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=self.cwd,
+            limit=self.max_line
+        )
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        try:
+            while True:
+                try:
+                    line = await self.process.stdout.readline()
+                except ValueError:
+                    # longer than max_line: the reader discards it, framing resumes at the next newline
+                    continue
+                if not line:
+                    break
+                # skip banners and tool prints, which may also share a line with a response
+                starts = [pos for pos in (line.find(b"[{"), line.find(b"{")) if pos >= 0]
+                if not starts:
+                    continue
+                start = min(starts)
+                try:
+                    self._dispatch(json.loads(line[start:]))
+                except json.JSONDecodeError:
+                    continue
+        finally:
+            # whatever ends the loop, nothing pending will be answered any more
+            self._fail_pending(ConnectionError("server process exited"))
+
+    async def _send(self, message: dict):
+        if self._reader.done():
+            raise ConnectionError("server process exited")
+        async with self._write_lock:
+            self.process.stdin.write((json.dumps(message) + "\n").encode())
+            await self.process.stdin.drain()
+
+    async def _close(self):
+        if self.process is None:
+            return
+        if self.process.returncode is None:
+            self.process.terminate()
+        await self.process.wait()
+        if self._reader is not None:
+            await self._reader
+
+
+class HttpMCPClient(AsyncMCPClient):
+    """
+    MCP over streamable HTTP.
+
+    Every message is a POST on one pooled keep-alive client that carries the
+    `mcp-session-id` from the initialize response. Concurrent requests are
+    concurrent POSTs; each answer comes back as JSON or as a `text/event-stream`
+    on its own response.
+    """
+
+    def __init__(self, url: str = "http://localhost:8000/mcp/", max_connections: int = 16, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.max_connections = max_connections
+        self.http = None
+        self._posts = set()
+
+    async def _open(self):
+        self.http = httpx.AsyncClient(
+            headers={"Content-Type": "application/json", "Accept": "application/json, text/event-stream"},
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            timeout=httpx.Timeout(self.timeout)
+        )
+
+    async def _send(self, message: dict):
+        if "id" not in message:
+            response = await self.http.post(self.url, content=json.dumps(message))
+            response.raise_for_status()
+            return
+        # the response stream is read in the background so `request` can apply its own timeout
+        task = asyncio.create_task(self._post(message))
+        self._posts.add(task)
+        task.add_done_callback(self._posts.discard)
+
+    async def _post(self, message: dict):
+        try:
+            async with self.http.stream("POST", self.url, content=json.dumps(message)) as response:
+                response.raise_for_status()
+                session_id = response.headers.get("mcp-session-id")
+                if session_id:
+                    self.http.headers["mcp-session-id"] = session_id
+
+                if response.headers.get("content-type", "").startswith("text/event-stream"):
+                    # each message is dispatched as soon as its event is complete
+                    async for payload in aiter_sse_json(response.aiter_bytes()):
+                        self._dispatch(payload)
+                else:
+                    self._dispatch(json.loads(await response.aread()))
+        except Exception as e:
+            future = self._pending.get(message["id"])
+            if future is not None and not future.done():
+                future.set_exception(e)
+
+    async def _close(self):
+        if self.http is not None:
+            await self.http.aclose()
+
+
+async def _demo():
+    import time
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    async with StdioMCPClient(os.path.join(root, "servers", "math_server", "main.py"), cwd=root) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(client.call_tool("add", {"a": i, "b": 1}) for i in range(50)))
+        print(f"50 concurrent add calls in {time.perf_counter() - start:.3f}s")
+        print(results[-1])
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
@@ -0,0 +1,277 @@
+import asyncio
+import itertools
+import json
+import secrets
+import sys
+from contextlib import asynccontextmanager
+from io import TextIOWrapper
+
+import anyio
+import anyio.lowlevel
+import mcp.types as types
+from mcp.server.lowlevel import NotificationOptions
+from mcp.shared.message import SessionMessage
+
+from shared.sse import iter_sse_json
+
+# MCP dropped JSON-RPC batches from the protocol, so the SDK only understands
+# single messages. This layer sits between the wire and the SDK: a batch array
+# is split into its messages, which the server already handles as concurrent
+# tasks, and the responses are put back together in request order.
+
+INVALID_REQUEST = {"code": -32600, "message": "Invalid Request"}
+
+
+class BatchRouter:
+    """
+    Splits batch arrays into single messages and joins their responses.
+
+    Requests inside a batch get internal ids under a random prefix drawn per
+    router, so they do not collide with ids the client uses outside the batch
+    (or in another batch); a client would have to guess 128 random bits.
+    """
+
+    def __init__(self):
+        self._prefix = f"batch-{secrets.token_hex(16)}-"
+        self._ids = itertools.count(1)
+        self._owners = {}
+
+    def split(self, batch: list) -> tuple:
+        """
+        Returns:
+            (messages, ready): the single messages to hand to the server, and the
+            finished response array if nothing in the batch needs an answer from
+            it (None otherwise, or when the batch only holds notifications)
+        """
+        if not batch:
+            return [], [{"jsonrpc": "2.0", "id": None, "error": INVALID_REQUEST}]
+
+        state = {"responses": [], "remaining": 0}
+        messages = []
+        for element in batch:
+            if not isinstance(element, dict) or "method" not in element:
+                state["responses"].append({"jsonrpc": "2.0", "id": None, "error": INVALID_REQUEST})
+                continue
+            if "id" not in element:
+                # notifications never get a response
+                messages.append(element)
+                continue
+
+            internal_id = f"{self._prefix}{next(self._ids)}"
+            self._owners[internal_id] = (state, len(state["responses"]), element["id"])
+            state["responses"].append(None)
+            state["remaining"] += 1
+            messages.append({**element, "id": internal_id})
+
+        ready = state["responses"] if state["remaining"] == 0 and state["responses"] else None
+        return messages, ready
+
+    def join(self, response: dict) -> tuple:
+        """
+        Returns:
+            (claimed, ready): whether `response` belongs to a batch, and the full
+            response array once the last response of that batch has arrived
+        """
+        owner = self._owners.pop(response.get("id"), None)
+        if owner is None:
+            return False, None
+
+        state, index, original_id = owner
+        state["responses"][index] = {**response, "id": original_id}
+        state["remaining"] -= 1
+        return True, state["responses"] if state["remaining"] == 0 else None
+
+
+@asynccontextmanager
+async def batch_stdio_server():
+    """Drop-in for `mcp.server.stdio.stdio_server` that also accepts batch arrays."""
+    stdin = anyio.wrap_file(TextIOWrapper(sys.stdin.buffer, encoding="utf-8"))
+    stdout = anyio.wrap_file(TextIOWrapper(sys.stdout.buffer, encoding="utf-8"))
+
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+    router = BatchRouter()
+    write_lock = anyio.Lock()
+
+    async def write_line(payload):
+        async with write_lock:
+            await stdout.write(json.dumps(payload) + "\n")
+            await stdout.flush()
+
+    async def forward(message: dict):
+        try:
+            await read_stream_writer.send(SessionMessage(types.JSONRPCMessage.model_validate(message)))
+        except anyio.ClosedResourceError:
+            raise
+        except Exception as exc:
+            await read_stream_writer.send(exc)
+
+    async def stdin_reader():
+        try:
+            async with read_stream_writer:
+                async for line in stdin:
+                    try:
+                        payload = json.loads(line)
+                    except json.JSONDecodeError as exc:
+                        await read_stream_writer.send(exc)
+                        continue
+
+                    if not isinstance(payload, list):
+                        await forward(payload)
+                        continue
+
+                    messages, ready = router.split(payload)
+                    if ready:
+                        await write_line(ready)
+                    for message in messages:
+                        await forward(message)
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+
+    async def stdout_writer():
+        try:
+            async with write_stream_reader:
+                async for session_message in write_stream_reader:
+                    payload = session_message.message.model_dump(by_alias=True, mode="json", exclude_none=True)
+                    claimed, ready = router.join(payload)
+                    if not claimed:
+                        await write_line(payload)
+                    elif ready:
+                        await write_line(ready)
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(stdin_reader)
+        tg.start_soon(stdout_writer)
+        yield read_stream, write_stream
+
+
+async def run_stdio_async(mcp):
+    """Serve a FastMCP server over stdio with batch support, like `mcp.run(transport="stdio")`."""
+    server = mcp._mcp_server
+    async with batch_stdio_server() as (read_stream, write_stream):
+        await server.run(
+            read_stream,
+            write_stream,
+            server.create_initialization_options(NotificationOptions(tools_changed=True))
+        )
+
+
+def run_stdio(mcp):
+    anyio.run(run_stdio_async, mcp)
+
+
+class BatchHTTPMiddleware:
+    """
+    ASGI middleware giving the streamable HTTP transport batch support.
+
+    A POST whose body is a JSON array is replayed against the wrapped app as one
+    request per element, all at once, and answered with a single JSON array.
+    Everything else passes straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        if not body.lstrip().startswith(b"["):
+            replayed = False
+
+            async def replay():
+                nonlocal replayed
+                if replayed:
+                    return await receive()
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            return await self.app(scope, replay, send)
+
+        try:
+            batch = json.loads(body)
+        except json.JSONDecodeError:
+            return await self._respond(send, 400, {"jsonrpc": "2.0", "id": None,
+                                                   "error": {"code": -32700, "message": "Parse error"}})
+
+        router = BatchRouter()
+        messages, ready = router.split(batch)
+        results = await asyncio.gather(*(self._forward(scope, message) for message in messages))
+
+        headers = {}
+        for status, response_headers, replies in results:
+            headers.update({k: v for k, v in response_headers if k == b"mcp-session-id"})
+            for reply in replies:
+                _, joined = router.join(reply)
+                if joined is not None:
+                    ready = joined
+
+        if ready is None:
+            # only notifications, nothing to answer
+            return await self._respond(send, 202, None, headers)
+        return await self._respond(send, 200, ready, headers)
+
+    async def _forward(self, scope, message: dict) -> tuple:
+        body = json.dumps(message).encode()
+        headers = [(k, v) for k, v in scope["headers"] if k != b"content-length"]
+        headers.append((b"content-length", str(len(body)).encode()))
+        sub_scope = {**scope, "headers": headers}
+
+        finished = asyncio.Event()
+        sent_body = False
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        status, response_headers, chunks = 200, [], []
+
+        async def send(event):
+            nonlocal status, response_headers
+            if event["type"] == "http.response.start":
+                status, response_headers = event["status"], event.get("headers", [])
+            elif event["type"] == "http.response.body":
+                chunks.append(event.get("body", b""))
+
+        try:
+            await self.app(sub_scope, receive, send)
+        finally:
+            finished.set()
+
+        payload = b"".join(chunks)
+        content_type = dict(response_headers).get(b"content-type", b"")
+        if not payload:
+            replies = []
+        elif content_type.startswith(b"text/event-stream"):
+            replies = list(iter_sse_json([payload]))
+        else:
+            replies = json.loads(payload)
+            replies = replies if isinstance(replies, list) else [replies]
+
+        if "id" in message and not any(reply.get("id") == message["id"] for reply in replies):
+            # the transport rejected the request outright (e.g. HTTP 4xx), answer it with that error
+            error = next((reply["error"] for reply in replies if "error" in reply), None)
+            replies = [{"jsonrpc": "2.0", "id": message["id"],
+                        "error": error or {"code": -32603, "message": f"HTTP {status}"}}]
+        return status, response_headers, replies
+
+    @staticmethod
+    async def _respond(send, status: int, payload, headers: dict = None):
+        body = b"" if payload is None else json.dumps(payload).encode()
+        response_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        response_headers.extend((headers or {}).items())
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": body})
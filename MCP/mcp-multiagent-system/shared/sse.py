@@ -0,0 +1,122 @@
+import json
+import re
+from typing import NamedTuple
+
+# The streamable HTTP transport answers a POST with a `text/event-stream` whose
+# events carry one JSON-RPC message each in their `data` field. This decoder
+# takes the body in whatever chunks the network delivers and hands back each
+# event as soon as its terminating blank line has arrived.
+
+LINE_END = re.compile(rb"\r\n|\r|\n")
+
+
+class SSEEvent(NamedTuple):
+    event: str
+    data: str
+    id: str
+    retry: int = None
+
+
+class SSEDecoder:
+    """
+    Incremental `text/event-stream` decoder.
+
+    Example:
+        decoder = SSEDecoder()
+        for chunk in response.iter_content(chunk_size=None):
+            for event in decoder.feed(chunk):
+                print(event.event, event.data)
+        for event in decoder.flush():
+            ...
+    """
+
+    def __init__(self):
+        self.last_event_id = ""
+        self.retry = None
+        self._buffer = bytearray()
+        self._event = ""
+        self._data = []
+
+    def feed(self, chunk: bytes) -> list:
+        """Add raw bytes, returns the events completed by them."""
+        self._buffer.extend(chunk)
+        events = []
+        pos = 0
+        while True:
+            match = LINE_END.search(self._buffer, pos)
+            if match is None:
+                break
+            if match.group() == b"\r" and match.end() == len(self._buffer):
+                # could be the first half of a \r\n split across chunks
+                break
+            event = self._line(self._buffer[pos:match.start()].decode("utf-8"))
+            if event is not None:
+                events.append(event)
+            pos = match.end()
+        if pos:
+            del self._buffer[:pos]
+        return events
+
+    def flush(self) -> list:
+        """End of stream: an event missing its final blank line is still delivered."""
+        events = []
+        if self._buffer:
+            event = self._line(self._buffer.decode("utf-8").rstrip("\r"))
+            self._buffer.clear()
+            if event is not None:
+                events.append(event)
+        event = self._line("")
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _line(self, line: str):
+        if not line:
+            if not self._data:
+                self._event = ""
+                return None
+            event = SSEEvent(self._event or "message", "\n".join(self._data), self.last_event_id, self.retry)
+            self._event = ""
+            self._data = []
+            return event
+
+        if line.startswith(":"):
+            # comment, servers use these as keep-alive pings
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id" and "\0" not in value:
+            self.last_event_id = value
+        elif field == "retry" and value.isdigit():
+            self.retry = int(value)
+        return None
+
+
+def iter_sse_json(chunks):
+    """Yield the JSON payload of every event in a stream of byte chunks, as the events complete."""
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        for event in decoder.feed(chunk):
+            if event.data:
+                yield json.loads(event.data)
+    for event in decoder.flush():
+        if event.data:
+            yield json.loads(event.data)
+
+
+async def aiter_sse_json(chunks):
+    """Async version of `iter_sse_json`, e.g. over `httpx.Response.aiter_bytes()`."""
+    decoder = SSEDecoder()
+    async for chunk in chunks:
+        for event in decoder.feed(chunk):
+            if event.data:
+                yield json.loads(event.data)
+    for event in decoder.flush():
+        if event.data:
+            yield json.loads(event.data)
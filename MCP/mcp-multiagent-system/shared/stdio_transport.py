@@ -0,0 +1,212 @@
+import json
+import os
+import queue
+import re
+import selectors
+import sys
+import threading
+import time
+from collections import deque
+
+# Start of a JSON object or of a batch array, but not of a "[DEBUG]" print.
+JSON_START = re.compile(rb"\[\s*\{|\{")
+CHUNK_SIZE = 1 << 16
+
+
+class FrameTooLarge(ValueError):
+    """A single line grew past the transport's buffer limit without a newline."""
+
+
+class StdioTransport:
+    """
+    Newline-framed JSON-RPC over a subprocess's stdin / stdout.
+
+    Reading never spins: it waits on a selector (reader threads on Windows,
+    where pipes cannot be selected) and decodes whatever arrived into complete
+    lines, keeping a single bounded buffer per stream. stdout lines that are not
+    JSON (banners, tool prints) go to `logs`, stderr lines go to `stderr`, and
+    end of stream raises EOFError instead of returning empty reads forever.
+
+    The process must be started with binary pipes:
+        proc = subprocess.Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        transport = StdioTransport(proc)
+        response = transport.request({"jsonrpc": "2.0", "id": 1, "method": "tools/list"}, timeout=10)
+    """
+
+    def __init__(self, process, max_frame: int = 1 << 24, log_lines: int = 1000):
+        self.process = process
+        self.max_frame = max_frame
+        self.logs = deque(maxlen=log_lines)
+        self.stderr = deque(maxlen=log_lines)
+        self.eof = False
+
+        self._messages = deque()
+        self._write_lock = threading.Lock()
+        self._streams = {}
+        # streams in the middle of an oversized line, dropped up to its newline
+        self._discarding = set()
+        for stream, sink in ((process.stdout, self._on_stdout), (process.stderr, self._on_stderr)):
+            if stream is not None:
+                self._streams[stream.fileno()] = (bytearray(), sink)
+        self._stdout_fd = process.stdout.fileno()
+
+        if sys.platform == "win32":
+            self._selector = None
+            self._chunks = queue.Queue()
+            for fd in self._streams:
+                threading.Thread(target=self._read_thread, args=(fd, ), daemon=True).start()
+        else:
+            self._selector = selectors.DefaultSelector()
+            for fd in self._streams:
+                os.set_blocking(fd, False)
+                self._selector.register(fd, selectors.EVENT_READ)
+
+    # -- writing --
+
+    def send(self, message):
+        data = (json.dumps(message) + "\n").encode("utf-8")
+        with self._write_lock:
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+
+    # -- reading --
+
+    def read_message(self, timeout: float = None):
+        """
+        Next JSON message (an object, or a list for a batch response).
+
+        Raises:
+            EOFError: stdout closed and nothing is left to read
+            TimeoutError: nothing arrived within `timeout` seconds
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._messages:
+            if self.eof:
+                raise EOFError("server closed stdout")
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError("no message within timeout")
+            self._pump(remaining)
+        return self._messages.popleft()
+
+    def request(self, message, timeout: float = None):
+        """
+        Send a request (or a batch) and wait for its response.
+
+        Messages that do not answer it (server notifications, stale responses)
+        are skipped.
+        """
+        self.send(message)
+        if isinstance(message, list):
+            wanted = {item["id"] for item in message if "id" in item}
+        else:
+            wanted = {message.get("id")}
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            response = self.read_message(remaining)
+            if isinstance(response, list):
+                if wanted & {item.get("id") for item in response}:
+                    return response
+            elif response.get("id") in wanted:
+                return response
+
+    def _pump(self, timeout: float):
+        oversized = False
+        for fd, chunk in self._wait(timeout):
+            buffer, sink = self._streams[fd]
+            if not chunk:
+                # end of stream: whatever is left is a final, unterminated line
+                if buffer:
+                    sink(bytes(buffer))
+                    buffer.clear()
+                if fd == self._stdout_fd:
+                    self.eof = True
+                continue
+            if self._frame(fd, chunk):
+                if fd == self._stdout_fd:
+                    oversized = True
+                else:
+                    self.stderr.append(f"[stderr line longer than {self.max_frame} bytes dropped]")
+        # raised only once every chunk of this round is framed, so nothing else is lost
+        if oversized:
+            raise FrameTooLarge(f"line longer than {self.max_frame} bytes")
+
+    def _frame(self, fd: int, chunk: bytes) -> bool:
+        """Split a chunk into lines for the stream's sink; True if a line overflowed `max_frame`."""
+        buffer, sink = self._streams[fd]
+        if fd in self._discarding:
+            newline = chunk.find(b"\n")
+            if newline < 0:
+                return False
+            self._discarding.discard(fd)
+            chunk = chunk[newline + 1:]
+
+        start = len(buffer)
+        buffer.extend(chunk)
+        consumed = 0
+        newline = buffer.find(b"\n", start)
+        while newline >= 0:
+            sink(bytes(buffer[consumed:newline]))
+            consumed = newline + 1
+            newline = buffer.find(b"\n", consumed)
+        if consumed:
+            del buffer[:consumed]
+        if len(buffer) > self.max_frame:
+            buffer.clear()
+            self._discarding.add(fd)
+            return True
+        return False
+
+    def _on_stdout(self, line: bytes):
+        match = JSON_START.search(line)
+        if match is not None:
+            try:
+                self._messages.append(json.loads(line[match.start():]))
+                if match.start():
+                    # a tool print that ended up on the same line as a response
+                    self.logs.append(line[:match.start()].decode("utf-8", "replace").strip())
+                return
+            except json.JSONDecodeError:
+                pass
+        text = line.decode("utf-8", "replace").strip()
+        if text:
+            self.logs.append(text)
+
+    def _on_stderr(self, line: bytes):
+        self.stderr.append(line.decode("utf-8", "replace").rstrip())
+
+    def _wait(self, timeout: float) -> list:
+        if self._selector is None:
+            try:
+                ready = [self._chunks.get(timeout=timeout)]
+            except queue.Empty:
+                return []
+            while not self._chunks.empty():
+                ready.append(self._chunks.get_nowait())
+            return ready
+
+        ready = []
+        for key, _ in self._selector.select(timeout):
+            try:
+                chunk = os.read(key.fd, CHUNK_SIZE)
+            except BlockingIOError:
+                continue
+            if not chunk:
+                self._selector.unregister(key.fd)
+            ready.append((key.fd, chunk))
+        return ready
+
+    def _read_thread(self, fd: int):
+        while True:
+            chunk = os.read(fd, CHUNK_SIZE)
+            self._chunks.put((fd, chunk))
+            if not chunk:
+                return
+
+    def close(self):
+        if self._selector is not None:
+            self._selector.close()
+        if self.process.poll() is None:
+            self.process.terminate()
@@ -0,0 +1,157 @@
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Per-tool policies, as written in a server's config.json under "cache":
+#   {"policy": "pure"}             result depends only on the arguments, keep until evicted
+#   {"policy": "ttl", "ttl": 60}   result is valid for `ttl` seconds
+#   {"policy": "none"}             never cached (the default for unknown tools)
+PURE = "pure"
+TTL = "ttl"
+NONE = "none"
+
+
+class ToolCache:
+    """
+    Bounded LRU cache of tool results, keyed by tool name and arguments.
+
+    Hits and misses are counted per tool so the effect of the cache can be
+    inspected (`stats`). Thread safe, since sync tools may run on worker threads.
+    """
+
+    def __init__(self, max_entries: int = 1024, policies: dict = None):
+        self.max_entries = max_entries
+        self.policies = policies or {}
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict):
+        return cls(max_entries=config.get("max_entries", 1024), policies=config.get("tools", {}))
+
+    def policy(self, tool: str) -> dict:
+        return self.policies.get(tool, {"policy": NONE})
+
+    def cacheable(self, tool: str) -> bool:
+        return self.policy(tool).get("policy", NONE) != NONE
+
+    @staticmethod
+    def key(tool: str, arguments: dict) -> str:
+        return tool + ":" + json.dumps(arguments, sort_keys=True, default=str)
+
+    def _count(self, tool: str, field: str):
+        counters = self._counters.setdefault(tool, {"hits": 0, "misses": 0})
+        counters[field] += 1
+
+    def get(self, tool: str, arguments: dict) -> tuple:
+        """Returns (hit, value)."""
+        key = self.key(tool, arguments)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self._count(tool, "hits")
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._count(tool, "misses")
+            return False, None
+
+    def put(self, tool: str, arguments: dict, value):
+        policy = self.policy(tool)
+        if policy.get("policy", NONE) == NONE:
+            return
+        expires = time.monotonic() + policy["ttl"] if policy["policy"] == TTL else None
+
+        key = self.key(tool, arguments)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            tools = {tool: dict(counters) for tool, counters in self._counters.items()}
+            entries = len(self._entries)
+        hits = sum(counters["hits"] for counters in tools.values())
+        misses = sum(counters["misses"] for counters in tools.values())
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "tools": tools,
+        }
+
+    def wrap(self, tool: str, fn):
+        """Wrap a tool function so calls with the same arguments are answered from the cache."""
+        if not self.cacheable(tool):
+            return fn
+        signature = inspect.signature(fn)
+
+        def arguments_of(args, kwargs) -> dict:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return dict(bound.arguments)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def cached_async(*args, **kwargs):
+                arguments = arguments_of(args, kwargs)
+                hit, value = self.get(tool, arguments)
+                if not hit:
+                    value = await fn(*args, **kwargs)
+                    self.put(tool, arguments, value)
+                return value
+            return cached_async
+
+        @functools.wraps(fn)
+        def cached(*args, **kwargs):
+            arguments = arguments_of(args, kwargs)
+            hit, value = self.get(tool, arguments)
+            if not hit:
+                value = fn(*args, **kwargs)
+                self.put(tool, arguments, value)
+            return value
+        return cached
+
+
+class CachingRegistrar:
+    """
+    Stands in for the FastMCP server inside a tool module's `register(mcp)`.
+
+    `@mcp.tool(name=...)` wraps the function with the cache before handing it
+    to the real server; everything else is passed through untouched, so tool
+    modules need no changes.
+    """
+
+    def __init__(self, mcp, cache: ToolCache):
+        self._mcp = mcp
+        self._cache = cache
+
+    def tool(self, *args, **kwargs):
+        register = self._mcp.tool(*args, **kwargs)
+
+        def decorator(fn):
+            return register(self._cache.wrap(kwargs.get("name") or fn.__name__, fn))
+        return decorator
+
+    def __getattr__(self, attr):
+        return getattr(self._mcp, attr)
+
+
+def register_cache_resource(mcp, cache: ToolCache, uri: str = "cache://stats"):
+    """Expose the hit / miss counters as a JSON resource."""
+    @mcp.resource(uri, name="cache_stats", description="Tool result cache hit/miss counters", mime_type="application/json")
+    def cache_stats() -> str:
+        return json.dumps(cache.stats())
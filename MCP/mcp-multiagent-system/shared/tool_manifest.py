@@ -0,0 +1,145 @@
+import importlib.util
+import json
+import os
+import sys
+import threading
+
+from fastmcp.tools import Tool
+from fastmcp.tools.tool import FunctionTool
+from pydantic import PrivateAttr
+
+# A tool manifest lists every tool of a server with what clients need to see
+# (name, description, input / output schema) and where its code lives. Servers
+# register tools straight from it and only import a tool's module the first
+# time the tool is called, so start-up does not grow with the number of tools.
+#
+# Build or refresh it after adding or changing tools:
+#     python shared/tool_manifest.py servers/math_server
+MANIFEST_FILE = "tool_manifest.json"
+MANIFEST_VERSION = 1
+
+
+class ToolCollector:
+    """Stands in for the server inside `register(mcp)` and just records the tools a module defines."""
+
+    def __init__(self):
+        self.tools = []
+
+    def tool(self, *args, name: str = None, description: str = None, **kwargs):
+        def decorator(fn):
+            self.tools.append((name or fn.__name__, description or fn.__doc__, fn))
+            return fn
+        return decorator
+
+
+def import_tool_module(path: str):
+    server_dir = os.path.dirname(os.path.dirname(path))
+    if server_dir not in sys.path:
+        # tool modules import siblings such as resources.constants
+        sys.path.insert(0, server_dir)
+    module_name = f"{os.path.basename(server_dir)}_tool_{os.path.splitext(os.path.basename(path))[0]}"
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def collect_tools(path: str) -> list:
+    mod = import_tool_module(path)
+    collector = ToolCollector()
+    if hasattr(mod, "register"):
+        mod.register(collector)
+    return collector.tools
+
+
+def build_manifest(server_dir: str) -> dict:
+    """Import every tool module of a server once and describe its tools."""
+    tools_dir = os.path.join(server_dir, "tools")
+    tools = []
+    for fname in sorted(os.listdir(tools_dir)):
+        if not fname.endswith(".py"):
+            continue
+        module = os.path.join("tools", fname)
+        for name, description, fn in collect_tools(os.path.join(tools_dir, fname)):
+            tool = FunctionTool.from_function(fn, name=name, description=description)
+            tools.append({
+                "name": name,
+                "description": tool.description,
+                "input_schema": tool.parameters,
+                "output_schema": tool.output_schema,
+                "module": module.replace(os.sep, "/"),
+            })
+    return {"version": MANIFEST_VERSION, "tools": tools}
+
+
+def write_manifest(server_dir: str) -> str:
+    path = os.path.join(server_dir, MANIFEST_FILE)
+    with open(path, "w") as f:
+        json.dump(build_manifest(server_dir), f, indent=2)
+    return path
+
+
+class LazyTool(Tool):
+    """A tool advertised from the manifest whose module is imported on its first call."""
+
+    _module_path: str = PrivateAttr()
+    _wrap = PrivateAttr(default=None)
+    _real = PrivateAttr(default=None)
+    _lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, module_path: str, wrap=None, **kwargs):
+        super().__init__(**kwargs)
+        self._module_path = module_path
+        self._wrap = wrap
+
+    def _load(self) -> FunctionTool:
+        with self._lock:
+            if self._real is None:
+                for name, description, fn in collect_tools(self._module_path):
+                    if name == self.name:
+                        if self._wrap is not None:
+                            fn = self._wrap(name, fn)
+                        self._real = FunctionTool.from_function(fn, name=name, description=self.description)
+                        break
+                else:
+                    raise RuntimeError(f"{self._module_path} no longer defines tool {self.name!r}, rebuild the manifest")
+            return self._real
+
+    async def run(self, arguments: dict):
+        return await self._load().run(arguments)
+
+
+def register_from_manifest(mcp, server_dir: str, wrap=None) -> bool:
+    """
+    Register every tool listed in the server's manifest without importing any tool code.
+
+    Args:
+        wrap: Optional `wrap(name, fn)` applied to a tool function when it is loaded, e.g. `ToolCache.wrap`
+
+    Returns:
+        False if there is no manifest, so the caller can fall back to loading the tool modules
+    """
+    path = os.path.join(server_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return False
+    with open(path, "r") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return False
+
+    for entry in manifest["tools"]:
+        mcp.add_tool(LazyTool(
+            os.path.join(server_dir, entry["module"]),
+            wrap=wrap,
+            name=entry["name"],
+            description=entry["description"],
+            parameters=entry["input_schema"],
+            output_schema=entry["output_schema"],
+        ))
+    return True
+
+
+if __name__ == "__main__":
+    for server_dir in sys.argv[1:]:
+        path = write_manifest(os.path.abspath(server_dir))
+        print(f"wrote {path}")
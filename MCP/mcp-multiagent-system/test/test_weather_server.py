@@ -1,49 +1,35 @@
 import subprocess
 import json
+import os
 import sys
-import time
-import re
 
-def wait_for_json_response(proc):
-    """
-    Reads lines from the subprocess until it gets a valid JSON-RPC response.
-    """
-    buffer = ""
-    while True:
-        line = proc.stdout.readline()
-        if not line:
-            continue
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-        line = line.strip()
+from shared.stdio_transport import StdioTransport
 
-        # Skip banners, empty lines, and logs
-        if not line or not line.startswith("{"):
-            continue
+TIMEOUT = 30
 
-        try:
-            parsed = json.loads(line)
-            return parsed
-        except json.JSONDecodeError:
-            buffer += line
-            try:
-                return json.loads(buffer)
-            except json.JSONDecodeError:
-                continue
+def send_jsonrpc(transport, request):
+    """
+    Sends one request, or a list of requests as a single JSON-RPC batch.
+    For a batch the responses are returned in request order.
+    """
+    response = transport.request(request, timeout=TIMEOUT)
 
-def send_jsonrpc(proc, request):
-    proc.stdin.write(json.dumps(request) + "\n")
-    proc.stdin.flush()
-    return wait_for_json_response(proc)
+    if isinstance(request, list) and isinstance(response, list):
+        by_id = {item.get("id"): item for item in response}
+        return [by_id.get(item["id"]) for item in request if "id" in item]
+    return response
 
 # Start the server
 proc = subprocess.Popen(
     [sys.executable, "servers/math_server/main.py"],
     stdin=subprocess.PIPE,
     stdout=subprocess.PIPE,
-    stderr=subprocess.PIPE,
-    text=True,
-    bufsize=1  # Line-buffered
+    stderr=subprocess.PIPE
 )
+# banners and tool prints are kept apart from responses, stderr separately
+transport = StdioTransport(proc)
 
 try:
     print("Initializing...")
@@ -57,9 +43,12 @@ try:
             "clientInfo": {"name": "test-client", "version": "1.0"}
         }
     }
-    init_resp = send_jsonrpc(proc, init_req)
+    init_resp = send_jsonrpc(transport, init_req)
     print(json.dumps(init_resp, indent=2))
 
+    # the session only accepts requests once the client confirms initialization
+    transport.send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
     print("Calling add...")
     add_req = {
         "jsonrpc": "2.0",
@@ -70,8 +59,31 @@ try:
             "arguments": {"a": 3, "b": 4}
         }
     }
-    add_resp = send_jsonrpc(proc, add_req)
+    add_resp = send_jsonrpc(transport, add_req)
     print(json.dumps(add_resp, indent=2))
 
+    print("Calling area_of_circle in one batch...")
+    radii = [1, 2, 3, 4, 5]
+    batch_req = [
+        {
+            "jsonrpc": "2.0",
+            "id": f"area-{radius}",
+            "method": "tools/call",
+            "params": {
+                "name": "area_of_circle",
+                "arguments": {"radius": radius}
+            }
+        }
+        for radius in radii
+    ]
+    batch_resp = send_jsonrpc(transport, batch_req)
+    assert [item["id"] for item in batch_resp] == [req["id"] for req in batch_req]
+    print(json.dumps(batch_resp, indent=2))
+
+except (EOFError, TimeoutError):
+    print("Server stopped answering. stderr:")
+    print("\n".join(transport.stderr))
+    raise
+
 finally:
-    proc.terminate()
+    transport.close()
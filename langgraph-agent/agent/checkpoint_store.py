@@ -0,0 +1,584 @@
+"""
+checkpoint_store.py - Checkpointer backends for the Human-in-the-Loop Agent
+
+`make_checkpointer()` picks the backend from the environment:
+    AGENT_CHECKPOINTER=sqlite   (default) SQLiteCheckpointer on local disk
+    AGENT_CHECKPOINTER=memory   LangGraph's MemorySaver, lost on restart
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoints.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS threads_last_access ON threads (last_access);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+# ===========================================================
+# SQLite Checkpointer
+# ===========================================================
+class SQLiteCheckpointer(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer stored in a local SQLite database in WAL mode.
+
+    Conversations survive restarts, and several uvicorn workers can share one
+    database file: WAL lets readers run alongside the single writer, and
+    `busy_timeout` makes writers wait for each other instead of failing.
+
+    Every thread has a row in `threads` with its last access time and the bytes
+    it occupies, which drives eviction:
+    - threads idle for longer than `ttl_seconds` are dropped
+    - beyond `max_threads` threads or `max_bytes` bytes, least recently used
+      threads are dropped until the store fits again; threads used within the
+      last `min_idle_seconds` are never dropped, so running conversations survive;
+      it must exceed the longest graph run, or a thread can be dropped mid-run
+      and its remaining writes leave an entry without checkpoints behind
+    Eviction runs every `evict_every` writes. `compact()` additionally trims each
+    thread to its newest checkpoints and returns freed pages to the file system;
+    `start_compaction()` runs eviction and compaction on a background thread.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_DB_PATH,
+        ttl_seconds: Optional[float] = None,
+        max_threads: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        min_idle_seconds: float = 60.0,
+        keep_checkpoints: int = 2,
+        evict_every: int = 100,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.min_idle_seconds = min_idle_seconds
+        self.keep_checkpoints = keep_checkpoints
+        self.evict_every = evict_every
+        self.evicted = 0
+        self.compactions = 0
+
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self._stop = threading.Event()
+        self._compactor = None
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        # auto_vacuum only takes effect before the first table is created
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(SCHEMA)
+
+    # -------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------
+    def _touch(self, thread_id: str):
+        self.conn.execute("UPDATE threads SET last_access = ? WHERE thread_id = ?", (time.time(), thread_id))
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row: tuple, writes: list) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def _writes_for(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list:
+        return self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """
+        Get the checkpoint named in config, or the thread's latest one
+
+        Args:
+            config: Config with thread_id and optionally checkpoint_ns / checkpoint_id
+
+        Returns:
+            The checkpoint tuple, or None if the thread has no such checkpoint
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            writes = self._writes_for(thread_id, checkpoint_ns, row[0])
+            self._touch(thread_id)
+        return self._to_tuple(thread_id, checkpoint_ns, row, writes)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """
+        List checkpoints, newest first
+
+        Args:
+            config: Restrict to this thread (and checkpoint_ns / checkpoint_id if given)
+            filter: Metadata key / value pairs the checkpoints must match
+            before: Only checkpoints older than this one
+            limit: Maximum number of checkpoints to return
+        """
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                f"metadata_type, metadata FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+
+        for thread_id, checkpoint_ns, *row in rows:
+            if filter:
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            with self._lock:
+                writes = self._writes_for(thread_id, checkpoint_ns, row[0])
+            yield self._to_tuple(thread_id, checkpoint_ns, tuple(row), writes)
+
+    # -------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------
+    def _account(self, thread_id: str, size: int):
+        self.conn.execute(
+            "INSERT INTO threads (thread_id, last_access, bytes) VALUES (?, ?, ?) "
+            "ON CONFLICT (thread_id) DO UPDATE SET last_access = excluded.last_access, bytes = bytes + excluded.bytes",
+            (thread_id, time.time(), size),
+        )
+
+    def _after_write(self):
+        self._writes_since_evict += 1
+        if self._writes_since_evict >= self.evict_every:
+            self._writes_since_evict = 0
+            self._evict()
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """
+        Save a checkpoint
+
+        Args:
+            config: Config of the parent checkpoint
+            checkpoint: The checkpoint to save
+            metadata: Metadata stored with the checkpoint
+            new_versions: Channel versions written by this step
+
+        Returns:
+            Config pointing at the saved checkpoint
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, data = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                    "type, checkpoint, metadata_type, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                     type_, data, metadata_type, metadata_data),
+                )
+                self._account(thread_id, (len(data) + len(metadata_data)) * cursor.rowcount)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self._after_write()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """
+        Save the pending writes of a task
+
+        Args:
+            config: Config of the checkpoint the writes belong to
+            writes: (channel, value) pairs
+            task_id: Task that produced the writes
+            task_path: Path of that task
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self.serde.dumps_typed(value)
+            # special channels (errors, interrupts, resumes) overwrite, ordinary writes are kept once
+            verb = "INSERT OR REPLACE" if channel in WRITES_IDX_MAP else "INSERT OR IGNORE"
+            rows.append((verb, (thread_id, checkpoint_ns, checkpoint_id, task_id,
+                                WRITES_IDX_MAP.get(channel, idx), channel, type_, data, task_path)))
+
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                size = 0
+                for verb, params in rows:
+                    cursor = self.conn.execute(
+                        f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, "
+                        "type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        params,
+                    )
+                    size += len(params[7]) * cursor.rowcount
+                self._account(thread_id, size)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self._after_write()
+
+    def _delete_threads(self, thread_ids: list):
+        for table in ("writes", "checkpoints", "threads"):
+            self.conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", [(t, ) for t in thread_ids])
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete all checkpoints and writes of a thread"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._delete_threads([thread_id])
+            self.conn.execute("COMMIT")
+
+    # -------------------------------------------------------
+    # Eviction, size accounting and compaction
+    # -------------------------------------------------------
+    def _evict(self) -> int:
+        """Drop expired threads, then least recently used ones until within limits (lock held)"""
+        victims = []
+        if self.ttl_seconds is not None:
+            victims += [row[0] for row in self.conn.execute(
+                "SELECT thread_id FROM threads WHERE last_access < ?", (time.time() - self.ttl_seconds, ))]
+
+        if self.max_threads is not None or self.max_bytes is not None:
+            count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM threads").fetchone()
+            expired = set(victims)
+            idle = self.conn.execute(
+                "SELECT thread_id, bytes FROM threads WHERE last_access < ? ORDER BY last_access",
+                (time.time() - self.min_idle_seconds, ),
+            ).fetchall()
+            for thread_id, size in idle:
+                over_threads = self.max_threads is not None and count > self.max_threads
+                over_bytes = self.max_bytes is not None and total > self.max_bytes
+                if not (over_threads or over_bytes):
+                    break
+                if thread_id not in expired:
+                    victims.append(thread_id)
+                count -= 1
+                total -= size
+
+        if victims:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._delete_threads(victims)
+            self.conn.execute("COMMIT")
+            self.evicted += len(victims)
+        return len(victims)
+
+    def evict(self) -> int:
+        """
+        Apply the TTL and LRU limits now
+
+        Returns:
+            Number of threads removed
+        """
+        with self._lock:
+            return self._evict()
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        Evict, trim every thread to its newest `keep_checkpoints` checkpoints,
+        recount sizes and hand free pages back to the file system
+
+        Returns:
+            The stats after compaction
+        """
+        with self._lock:
+            self._evict()
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute(
+                "DELETE FROM checkpoints WHERE rowid IN ("
+                "  SELECT rowid FROM ("
+                "    SELECT rowid, ROW_NUMBER() OVER ("
+                "      PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS age"
+                "    FROM checkpoints) WHERE age > ?)",
+                (self.keep_checkpoints, ),
+            )
+            self.conn.execute(
+                "DELETE FROM writes WHERE NOT EXISTS ("
+                "  SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id"
+                "  AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)"
+            )
+            self.conn.execute(
+                "UPDATE threads SET bytes = "
+                "  COALESCE((SELECT SUM(LENGTH(checkpoint) + LENGTH(metadata)) FROM checkpoints c"
+                "            WHERE c.thread_id = threads.thread_id), 0)"
+                "+ COALESCE((SELECT SUM(LENGTH(value)) FROM writes w WHERE w.thread_id = threads.thread_id), 0)"
+            )
+            self.conn.execute("COMMIT")
+            self.conn.execute("PRAGMA incremental_vacuum")
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.compactions += 1
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        """Size accounting for the store"""
+        with self._lock:
+            threads, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM threads").fetchone()
+            checkpoints = self.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+            page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+            pages = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        wal_path = self.path + "-wal"
+        return {
+            "backend": "sqlite",
+            "threads": threads,
+            "checkpoints": checkpoints,
+            "data_bytes": total,
+            "file_bytes": page_size * pages,
+            "free_bytes": page_size * free_pages,
+            "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+            "evicted_threads": self.evicted,
+            "compactions": self.compactions,
+        }
+
+    def start_compaction(self, interval: float = 300.0):
+        """Run `compact()` every `interval` seconds on a daemon thread"""
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.compact()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Checkpoint compaction failed: {e}")
+
+        if self._compactor is None:
+            self._compactor = threading.Thread(target=loop, name="checkpoint-compactor", daemon=True)
+            self._compactor.start()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            self.conn.close()
+
+    # -------------------------------------------------------
+    # Async API: the sync calls run on the loop's default executor
+    # -------------------------------------------------------
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._run(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ):
+        items = await self._run(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await self._run(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await self._run(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await self._run(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+# ===========================================================
+# Backend Selection
+# ===========================================================
+DEFAULT_THREAD_TTL = 86400.0
+DEFAULT_MAX_THREADS = 100_000
+
+
+def _limit(name: str, cast, default):
+    """An eviction limit from the environment: unset keeps `default`, 0 or empty means no limit"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    if not value:
+        return None
+    return cast(value) or None
+
+
+def make_checkpointer(backend: Optional[str] = None):
+    """
+    Create the checkpointer selected by `backend` or AGENT_CHECKPOINTER
+
+    Environment (sqlite backend):
+        AGENT_CHECKPOINT_DB: database path (default: checkpoints.sqlite next to this file)
+        AGENT_THREAD_TTL: seconds a thread may stay idle before it is evicted (default: one day)
+        AGENT_MAX_THREADS: maximum number of stored threads (default: 100000)
+        AGENT_MAX_CHECKPOINT_BYTES: maximum stored bytes across all threads (default: no limit)
+        AGENT_MIN_IDLE: seconds a thread is protected from LRU eviction after its
+            last use (default: 60); keep it above the longest graph run
+    Set any limit to 0 to disable it.
+
+    Returns:
+        A LangGraph checkpointer
+    """
+    backend = (backend or os.getenv("AGENT_CHECKPOINTER", "sqlite")).lower()
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "sqlite":
+        return SQLiteCheckpointer(
+            path=os.getenv("AGENT_CHECKPOINT_DB", DEFAULT_DB_PATH),
+            ttl_seconds=_limit("AGENT_THREAD_TTL", float, DEFAULT_THREAD_TTL),
+            max_threads=_limit("AGENT_MAX_THREADS", int, DEFAULT_MAX_THREADS),
+            max_bytes=_limit("AGENT_MAX_CHECKPOINT_BYTES", int, None),
+            min_idle_seconds=float(os.getenv("AGENT_MIN_IDLE", "60")),
+        )
+    raise ValueError(f"Unknown checkpointer backend: {backend!r} (expected 'sqlite' or 'memory')")
@@ -7,20 +7,113 @@ Or: uvicorn api:app --reload
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from contextlib import AsyncExitStack, asynccontextmanager
+import asyncio
+import json
+import os
 import uuid
 
 # Import the agent from agent.py
 from main import HITLAgent
 
+# ===========================================================
+# Concurrency Control
+# ===========================================================
+class ConcurrencyLimiter:
+    """
+    Admits at most `max_concurrent` graph runs at a time.
+    
+    Up to `max_queue` more requests wait for a slot (at most `queue_timeout`
+    seconds); anything beyond that is shed right away with 429, so overload
+    turns into fast rejections instead of ever-growing latency.
+    """
+    
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+    
+    def _reject(self, reason: str):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy ({reason}), retry later",
+            headers={"Retry-After": "1"}
+        )
+    
+    @asynccontextmanager
+    async def slot(self):
+        if not self._semaphore.locked():
+            # a free slot is taken without suspending
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self._reject("queue full")
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("queue timeout")
+            finally:
+                self.waiting -= 1
+        
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+    
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue
+        }
+
+
+# Initialize the agent
+agent = HITLAgent(max_sync_workers=int(os.getenv("AGENT_SYNC_WORKERS", "16")))
+
+# graphs a single /ask/batch request may run at once, and its maximum size
+BATCH_PARALLELISM = int(os.getenv("AGENT_BATCH_PARALLELISM", "32"))
+MAX_BATCH_SIZE = int(os.getenv("AGENT_MAX_BATCH", "1000"))
+
+limiter = ConcurrencyLimiter(
+    max_concurrent=int(os.getenv("AGENT_MAX_CONCURRENCY", "256")),
+    max_queue=int(os.getenv("AGENT_MAX_QUEUE", "1024")),
+    queue_timeout=float(os.getenv("AGENT_QUEUE_TIMEOUT", "30"))
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # sync graph nodes run on the loop's default executor, keep it bounded
+    asyncio.get_running_loop().set_default_executor(agent.executor)
+    if hasattr(agent.checkpointer, "start_compaction"):
+        agent.checkpointer.start_compaction(float(os.getenv("AGENT_COMPACTION_INTERVAL", "300")))
+    yield
+    agent.close()
+
+
 # ===========================================================
 # FastAPI App Setup
 # ===========================================================
 app = FastAPI(
     title="Human-in-the-Loop Agent API",
     description="API for interacting with a LangGraph agent that supports human clarifications",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware (for frontend integration)
@@ -32,9 +125,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize the agent
-agent = HITLAgent()
-
 # ===========================================================
 # Request/Response Models
 # ===========================================================
@@ -74,6 +164,31 @@ class AgentResponse(BaseModel):
     thread_id: str
 
 
+class BatchQuestionRequest(BaseModel):
+    """Request model for asking many questions at once"""
+    questions: List[QuestionRequest]
+    max_parallel: Optional[int] = None
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "questions": [
+                    {"question": "When was the Eiffel Tower built?", "thread_id": "eval-1"},
+                    {"question": "Who designed the Eiffel Tower?"}
+                ],
+                "max_parallel": 8
+            }
+        }
+
+
+class BatchResponse(BaseModel):
+    """Response model for batch questions, one result per question in request order"""
+    results: List[AgentResponse]
+    completed: int
+    awaiting_clarification: int
+    failed: int
+
+
 # ===========================================================
 # API Endpoints
 # ===========================================================
@@ -89,6 +204,8 @@ async def root():
             "GET /health": "Health check",
             "GET /docs": "Interactive API documentation",
             "POST /ask": "Start a new conversation",
+            "POST /ask/stream": "Start a new conversation, progress streamed as server-sent events",
+            "POST /ask/batch": "Start many conversations in one request",
             "POST /clarify": "Provide clarification to continue conversation"
         }
     }
@@ -100,7 +217,10 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "Human-in-the-Loop Agent",
-        "graph_initialized": agent.graph is not None
+        "graph_initialized": agent.graph is not None,
+        "concurrency": limiter.stats(),
+        "checkpoints": agent.checkpointer.stats() if hasattr(agent.checkpointer, "stats") else {"backend": "memory"},
+        "retrieval": agent.index.stats() if agent.index is not None else {"backend": "demo context"}
     }
 
 
@@ -116,6 +236,7 @@ async def ask_question(request: QuestionRequest):
     **Returns:**
     - If the agent needs clarification: status="awaiting_clarification" with a message
     - If the agent has an answer: status="completed" with final_answer
+    - 429 if the server is at its concurrency limit and the wait queue is full
     
     **Example:**
     ```json
@@ -134,7 +255,8 @@ async def ask_question(request: QuestionRequest):
         print(f"   Thread ID: {thread_id}")
         
         # Start conversation
-        result = agent.start_conversation(request.question, thread_id)
+        async with limiter.slot():
+            result = await agent.astart_conversation(request.question, thread_id)
         
         print(f"   Status: {result['status']}")
         
@@ -145,11 +267,144 @@ async def ask_question(request: QuestionRequest):
             thread_id=result["thread_id"]
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error in /ask: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/ask/batch", response_model=BatchResponse)
+async def ask_questions_batch(request: BatchQuestionRequest):
+    """
+    Start many conversations in one request, e.g. for evaluation runs
+    
+    **Parameters:**
+    - **questions**: List of {question, thread_id}; thread_id is optional
+    - **max_parallel**: Optional cap on graphs run at once (never above the server's AGENT_BATCH_PARALLELISM
+      or AGENT_MAX_CONCURRENCY)
+    
+    **Returns:**
+    - One result per question, in order, each with its own status:
+      "completed", "awaiting_clarification" (continue it with /clarify) or "error"
+    - Counts per status
+    - 400 if two questions share a thread_id
+    - 413 if the batch is larger than AGENT_MAX_BATCH
+    
+    Every running question holds its own concurrency slot, exactly like /ask.
+    A question is only shed (status "error" with the reason) when other
+    requests saturate the server, never by the rest of its own batch.
+    """
+    if len(request.questions) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(request.questions)} questions exceeds the limit of {MAX_BATCH_SIZE}"
+        )
+    
+    # never more items than the limiter runs at once: the rest wait inside the
+    # batch, so only outside load can fill the wait queue and shed them
+    max_parallel = min(request.max_parallel or BATCH_PARALLELISM, BATCH_PARALLELISM, limiter.max_concurrent)
+    print(f"\n📥 Batch of {len(request.questions)} questions received (parallelism {max_parallel})")
+    
+    try:
+        results = await agent.astart_conversations(
+            [item.model_dump() for item in request.questions],
+            max_parallel=max(1, max_parallel),
+            admit=limiter.slot
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    responses = [
+        AgentResponse(
+            status=result["status"],
+            message=result.get("message"),
+            final_answer=result.get("final_answer"),
+            thread_id=result["thread_id"]
+        )
+        for result in results
+    ]
+    statuses = [response.status for response in responses]
+    print(f"   Completed: {statuses.count('completed')}, "
+          f"awaiting clarification: {statuses.count('awaiting_clarification')}, "
+          f"failed: {statuses.count('error')}")
+    
+    return BatchResponse(
+        results=responses,
+        completed=statuses.count("completed"),
+        awaiting_clarification=statuses.count("awaiting_clarification"),
+        failed=statuses.count("error")
+    )
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that releases `stack` once the response is done.
+    
+    The stack is closed however sending ends, including a client that
+    disconnects before the body generator ever starts.
+    """
+    
+    def __init__(self, content, stack: AsyncExitStack, **kwargs):
+        super().__init__(content, **kwargs)
+        self.stack = stack
+    
+    async def __call__(self, scope, receive, send):
+        async with self.stack:
+            await super().__call__(scope, receive, send)
+
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """
+    Start a new conversation and stream the agent's progress as server-sent events
+    
+    **Parameters:**
+    - **question**: The question to ask the agent
+    - **thread_id**: Optional unique identifier for this conversation (auto-generated if not provided)
+    
+    **Events** (`text/event-stream`, JSON data):
+    - `start`: {"thread_id"}
+    - `node`: {"node", "update"} after each graph node finishes
+    - `interrupt`: {"status": "awaiting_clarification", "message", "thread_id"}; continue with /clarify
+    - `final`: {"status": "completed", "final_answer", "thread_id"}
+    - `error`: {"detail"} if the run fails
+    
+    Returns 429 before any event if the server is at its concurrency limit and the wait queue is full.
+    """
+    thread_id = request.thread_id or f"thread-{uuid.uuid4()}"
+    
+    print(f"\n📥 New streamed question received")
+    print(f"   Question: {request.question}")
+    print(f"   Thread ID: {thread_id}")
+    
+    # take the slot now, so an overloaded server answers 429 instead of opening a stream
+    stack = AsyncExitStack()
+    await stack.enter_async_context(limiter.slot())
+    
+    async def events():
+        yield sse_event("start", {"thread_id": thread_id})
+        try:
+            async for event, data in agent.astream_conversation(request.question, thread_id):
+                yield sse_event(event, data)
+        except Exception as e:
+            print(f"❌ Error in /ask/stream: {e}")
+            yield sse_event("error", {"detail": str(e)})
+    
+    # the response owns the slot: released when sending ends, however it ends
+    return SlotStreamingResponse(
+        events(),
+        stack,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/clarify", response_model=AgentResponse)
 async def provide_clarification(request: ClarificationRequest):
     """
@@ -161,6 +416,7 @@ async def provide_clarification(request: ClarificationRequest):
     
     **Returns:**
     - The final answer after processing your clarification
+    - 429 if the server is at its concurrency limit and the wait queue is full
     
     **Example:**
     ```json
@@ -176,10 +432,11 @@ async def provide_clarification(request: ClarificationRequest):
         print(f"   Thread ID: {request.thread_id}")
         
         # Continue conversation with clarification
-        result = agent.continue_conversation(
-            request.clarification,
-            request.thread_id
-        )
+        async with limiter.slot():
+            result = await agent.acontinue_conversation(
+                request.clarification,
+                request.thread_id
+            )
         
         print(f"   Status: {result['status']}")
         
@@ -190,6 +447,8 @@ async def provide_clarification(request: ClarificationRequest):
             thread_id=result["thread_id"]
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error in /clarify: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -210,6 +469,8 @@ if __name__ == "__main__":
     print("\n🔗 Endpoints:")
     print("   • GET  /health")
     print("   • POST /ask")
+    print("   • POST /ask/stream")
+    print("   • POST /ask/batch")
     print("   • POST /clarify")
     print("\n" + "=" * 70 + "\n")
     
@@ -3,6 +3,9 @@ test_api.py - Interactive API Testing Script
 """
 import requests
 import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 BASE_URL = "http://localhost:8000"
@@ -69,6 +72,67 @@ class APITester:
             print(f"❌ Error: {e}")
             return "error", None
     
+    def ask_question_stream(self, question: str, thread_id: Optional[str] = None):
+        """Ask a question via /ask/stream and print events as they arrive"""
+        self.print_separator("Asking Question (streamed)")
+        
+        data = {"question": question}
+        if thread_id:
+            data["thread_id"] = thread_id
+        
+        print(f"❓ Question: {question}")
+        start = time.perf_counter()
+        event, last = None, None
+        
+        try:
+            with requests.post(f"{self.base_url}/ask/stream", json=data, stream=True) as response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        last = json.loads(line[5:])
+                        elapsed = (time.perf_counter() - start) * 1000
+                        print(f"   [{elapsed:7.1f} ms] {event}: {last.get('node', '')}")
+            
+            if event == "interrupt":
+                self.current_thread_id = last["thread_id"]
+                print(f"\n🤖 Agent needs clarification:")
+                print(f"   {last['message']}")
+                return "awaiting_clarification", last
+            if event == "final":
+                self.current_thread_id = last["thread_id"]
+                print(f"\n✅ Final Answer:")
+                print(f"   {last['final_answer']}")
+                return "completed", last
+            return "error", last
+        
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return "error", None
+    
+    def ask_batch(self, questions: list, max_parallel: Optional[int] = None):
+        """Ask many questions in one /ask/batch request"""
+        self.print_separator(f"Batch of {len(questions)} Questions")
+        
+        data = {"questions": [{"question": question} for question in questions]}
+        if max_parallel:
+            data["max_parallel"] = max_parallel
+        
+        try:
+            start = time.perf_counter()
+            response = requests.post(f"{self.base_url}/ask/batch", json=data)
+            result = response.json()
+            
+            print(f"📊 HTTP {response.status_code} in {time.perf_counter() - start:.2f}s")
+            print(f"   Completed: {result['completed']}")
+            print(f"   Awaiting clarification: {result['awaiting_clarification']}")
+            print(f"   Failed: {result['failed']}")
+            return result
+        
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return None
+    
     def provide_clarification(self, clarification: str, thread_id: Optional[str] = None):
         """Provide clarification to continue conversation"""
         self.print_separator("Providing Clarification")
@@ -103,6 +167,36 @@ class APITester:
             print(f"❌ Error: {e}")
             return "error", None
     
+    def test_concurrent_load(self, count: int = 200):
+        """Fire many /ask requests at once and check /health stays responsive"""
+        self.print_separator(f"Concurrent Load ({count} questions)")
+        
+        def ask(i):
+            try:
+                response = requests.post(
+                    f"{self.base_url}/ask",
+                    json={"question": "When was the Eiffel Tower built?", "thread_id": f"load-{i}"}
+                )
+                return response.status_code
+            except Exception as e:
+                return type(e).__name__
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=64) as executor:
+            futures = [executor.submit(ask, i) for i in range(count)]
+            
+            health_start = time.perf_counter()
+            health = requests.get(f"{self.base_url}/health").json()
+            print(f"🩺 /health under load: {(time.perf_counter() - health_start) * 1000:.1f} ms")
+            print(f"   Concurrency: {health.get('concurrency')}")
+            
+            codes = Counter(future.result() for future in futures)
+        
+        print(f"📊 Status codes: {dict(codes)} in {time.perf_counter() - start:.2f}s")
+        if codes.get(429):
+            print("⚠️  Some requests were shed with 429 (server at its concurrency limit)")
+        return codes
+    
     def interactive_conversation(self):
         """Run an interactive conversation"""
         self.print_separator("Interactive Conversation Mode")
@@ -156,6 +250,23 @@ class APITester:
         self.ask_question("What is the Eiffel Tower?", thread_id="session-A")
         self.ask_question("When was the Eiffel Tower built?", thread_id="session-B")
         
+        # Test 5: Many requests at once
+        print("\n\n5️⃣ Testing concurrent load...")
+        self.test_concurrent_load()
+        
+        # Test 6: Streamed progress
+        print("\n\n6️⃣ Testing streamed question...")
+        status, result = self.ask_question_stream(
+            "When was the Eiffel Tower built?",
+            thread_id="test-session-stream"
+        )
+        if status == "awaiting_clarification":
+            self.provide_clarification("The year (1889)", thread_id="test-session-stream")
+        
+        # Test 7: Batch of questions
+        print("\n\n7️⃣ Testing batch endpoint...")
+        self.ask_batch(["When was the Eiffel Tower built?"] * 100, max_parallel=16)
+        
         self.print_separator("All Tests Completed! ✅")
 
 
@@ -2,12 +2,18 @@
 agent.py - Modular Human-in-the-Loop LangGraph Agent
 """
 import os
+import asyncio
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from dotenv import load_dotenv
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncContextManager, AsyncIterator, Callable, Tuple
 from pydantic import BaseModel
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import interrupt, Command
-from langgraph.checkpoint.memory import MemorySaver
+from checkpoint_store import make_checkpointer
+from retrieval import RetrievalIndex, coverage
 
 # ===========================================================
 # Setup
@@ -15,6 +21,40 @@ from langgraph.checkpoint.memory import MemorySaver
 load_dotenv()
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 
+INDEX_DIR = os.getenv("AGENT_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "index"))
+DOCS_DIR = os.getenv("AGENT_DOCS_DIR")
+RETRIEVAL_TOP_K = int(os.getenv("AGENT_RETRIEVAL_TOP_K", "4"))
+# share of the query's terms the best passage must contain to answer without asking
+MIN_COVERAGE = float(os.getenv("AGENT_MIN_COVERAGE", "0.5"))
+
+
+# ===========================================================
+# Retrieval Index
+# ===========================================================
+_retrieval_index = None
+_retrieval_lock = threading.Lock()
+
+
+def get_retrieval_index() -> Optional[RetrievalIndex]:
+    """
+    Open the retrieval index once per process.
+
+    When AGENT_DOCS_DIR is set, new and changed files in it are indexed first.
+    Returns None when there is neither an index nor a docs folder, in which case
+    the nodes fall back to the built-in demo context.
+    """
+    global _retrieval_index
+    with _retrieval_lock:
+        if _retrieval_index is None:
+            if not DOCS_DIR and not os.path.exists(os.path.join(INDEX_DIR, "meta.json")):
+                return None
+            index = RetrievalIndex(INDEX_DIR)
+            if DOCS_DIR:
+                print(f"📚 Syncing retrieval index with {DOCS_DIR}: {index.sync_folder(DOCS_DIR)}")
+                index.save()
+            _retrieval_index = index
+        return _retrieval_index
+
 
 # ===========================================================
 # Agent State
@@ -24,6 +64,8 @@ class AgentState(BaseModel):
     context: str = ""
     clarify_questions: List[str] = []
     clarify_answers: List[str] = []
+    sources: List[str] = []
+    coverage: float = 0.0
     final_answer: Optional[str] = None
 
 
@@ -32,6 +74,17 @@ class AgentState(BaseModel):
 # ===========================================================
 def retrieve_context_node(state: AgentState):
     """Retrieve context based on question and clarifications"""
+    index = get_retrieval_index()
+    if index is not None:
+        print("🧠 Retrieving context from the document index...")
+        query = " ".join([state.question, *state.clarify_answers])
+        hits = index.search(query, k=RETRIEVAL_TOP_K)
+        return {
+            "context": "\n\n".join(hit.text for hit in hits),
+            "sources": [hit.doc_id for hit in hits],
+            "coverage": coverage(query, hits[0].text) if hits else 0.0,
+        }
+
     print("🧠 Retrieving context (RAG simulation)...")
 
     base_context = (
@@ -51,7 +104,13 @@ def analyze_context_node(state: AgentState):
     print("🔍 Analyzing context sufficiency...")
 
     clarify_needed = []
-    if "1889" not in state.context:
+    if get_retrieval_index() is not None:
+        # hybrid search always returns something; only a passage that
+        # actually mentions most of the query counts as an answer
+        sufficient = bool(state.sources) and state.coverage >= MIN_COVERAGE
+    else:
+        sufficient = "1889" in state.context
+    if not sufficient:
         clarify_needed.append(
             "Could you clarify what specific information you want (e.g., year, designer, or purpose)?"
         )
@@ -84,7 +143,12 @@ def clarify_node(state: AgentState) -> Command:
 def generate_answer_node(state: AgentState):
     """Generate final answer based on context"""
     print("💬 Generating final answer...")
-    
+
+    if state.sources:
+        passage = state.context.split("\n\n")[0]
+        sources = ", ".join(dict.fromkeys(state.sources))
+        return {"final_answer": f"{passage}\n\nSources: {sources}"}
+
     if "1889" in state.context or "year" in " ".join(state.clarify_answers):
         answer = (
             "The Eiffel Tower was completed in 1889 in Paris, France. "
@@ -102,8 +166,13 @@ def generate_answer_node(state: AgentState):
 # ===========================================================
 # Graph Builder
 # ===========================================================
-def build_graph():
-    """Build and compile the LangGraph workflow"""
+def build_graph(checkpointer=None):
+    """
+    Build and compile the LangGraph workflow
+
+    Args:
+        checkpointer: Where thread state is kept (default: make_checkpointer(), see checkpoint_store.py)
+    """
     graph = StateGraph(AgentState)
 
     # Add nodes
@@ -128,7 +197,8 @@ def build_graph():
     graph.add_edge("generate_answer", END)
 
     # Compile with checkpointer
-    checkpointer = MemorySaver()
+    if checkpointer is None:
+        checkpointer = make_checkpointer()
     return graph.compile(checkpointer=checkpointer)
 
 
@@ -136,27 +206,29 @@ def build_graph():
 # Agent Class
 # ===========================================================
 class HITLAgent:
-    """Human-in-the-Loop Agent wrapper"""
+    """
+    Human-in-the-Loop Agent wrapper
+
+    The sync methods block the calling thread for the whole graph run. Servers
+    should use the `a*` methods, which run the graph with `ainvoke` on the event
+    loop; LangGraph hands sync nodes to the loop's default executor, so install
+    `self.executor` there (`loop.set_default_executor(agent.executor)`) to keep
+    the number of node threads bounded.
+    """
     
-    def __init__(self):
-        self.graph = build_graph()
+    def __init__(self, max_sync_workers: int = 16, checkpointer=None):
+        self.checkpointer = checkpointer or make_checkpointer()
+        self.graph = build_graph(self.checkpointer)
+        # map the index now rather than in the first request
+        self.index = get_retrieval_index()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_sync_workers,
+            thread_name_prefix="hitl-node"
+        )
     
-    def start_conversation(self, question: str, thread_id: str = "default") -> Dict[str, Any]:
-        """
-        Start a new conversation with the agent
-        
-        Args:
-            question: The user's question
-            thread_id: Unique identifier for this conversation thread
-            
-        Returns:
-            Dictionary containing the result or interrupt information
-        """
-        config = {"configurable": {"thread_id": thread_id}}
-        inputs = AgentState(question=question)
-        
-        result = self.graph.invoke(inputs, config=config)
-        
+    @staticmethod
+    def _to_response(result: Dict[str, Any], thread_id: str) -> Dict[str, Any]:
+        """Turn a graph result into the status dictionary returned to callers"""
         # Check if we need clarification
         if "__interrupt__" in result:
             interrupt_data = result["__interrupt__"][0].value
@@ -174,6 +246,23 @@ class HITLAgent:
             "state": result
         }
     
+    def start_conversation(self, question: str, thread_id: str = "default") -> Dict[str, Any]:
+        """
+        Start a new conversation with the agent
+        
+        Args:
+            question: The user's question
+            thread_id: Unique identifier for this conversation thread
+            
+        Returns:
+            Dictionary containing the result or interrupt information
+        """
+        config = {"configurable": {"thread_id": thread_id}}
+        inputs = AgentState(question=question)
+        
+        result = self.graph.invoke(inputs, config=config)
+        return self._to_response(result, thread_id)
+    
     def continue_conversation(
         self, 
         clarification: str, 
@@ -187,7 +276,7 @@ class HITLAgent:
             thread_id: The thread ID from the previous interaction
             
         Returns:
-            Dictionary containing the final result
+            Dictionary containing the final result, or the next clarification request
         """
         config = {"configurable": {"thread_id": thread_id}}
         human_reply = {"clarification": clarification}
@@ -196,13 +285,171 @@ class HITLAgent:
             Command(resume=human_reply),
             config=config
         )
+        return self._to_response(result, thread_id)
+    
+    async def astart_conversation(self, question: str, thread_id: str = "default") -> Dict[str, Any]:
+        """
+        Async version of start_conversation, never blocks the event loop
         
-        return {
+        Args:
+            question: The user's question
+            thread_id: Unique identifier for this conversation thread
+            
+        Returns:
+            Dictionary containing the result or interrupt information
+        """
+        config = {"configurable": {"thread_id": thread_id}}
+        inputs = AgentState(question=question)
+        
+        result = await self.graph.ainvoke(inputs, config=config)
+        return self._to_response(result, thread_id)
+    
+    async def acontinue_conversation(
+        self, 
+        clarification: str, 
+        thread_id: str = "default"
+    ) -> Dict[str, Any]:
+        """
+        Async version of continue_conversation, never blocks the event loop
+        
+        Args:
+            clarification: User's clarification response
+            thread_id: The thread ID from the previous interaction
+            
+        Returns:
+            Dictionary containing the final result, or the next clarification request
+        """
+        config = {"configurable": {"thread_id": thread_id}}
+        human_reply = {"clarification": clarification}
+        
+        result = await self.graph.ainvoke(
+            Command(resume=human_reply),
+            config=config
+        )
+        return self._to_response(result, thread_id)
+    
+    @staticmethod
+    def _check_thread_ids(batch: List[Dict[str, Any]]):
+        """Two items on one thread would run concurrently against the same checkpoints"""
+        thread_ids = [item["thread_id"] for item in batch if item.get("thread_id")]
+        duplicates = sorted({thread_id for thread_id in thread_ids if thread_ids.count(thread_id) > 1})
+        if duplicates:
+            raise ValueError(f"thread_id used by more than one item: {', '.join(duplicates)}")
+    
+    def _run_batch_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        thread_id = item.get("thread_id") or f"thread-{uuid.uuid4()}"
+        try:
+            return self.start_conversation(item["question"], thread_id)
+        except Exception as e:
+            return {"status": "error", "message": str(e), "thread_id": thread_id}
+    
+    def start_conversations(self, batch: List[Dict[str, Any]], max_parallel: int = 16) -> List[Dict[str, Any]]:
+        """
+        Start many conversations at once, at most `max_parallel` running at a time
+        
+        Args:
+            batch: Items like {"question": ..., "thread_id": ...}; thread_id is optional
+            max_parallel: Upper bound on concurrently running graphs
+            
+        Returns:
+            One result per item, in order. A failing item gets status="error"
+            with the reason in "message" and does not affect the others.
+            
+        Raises:
+            ValueError: Two items share a thread_id
+        """
+        self._check_thread_ids(batch)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(batch)))) as pool:
+            return list(pool.map(self._run_batch_item, batch))
+    
+    async def astart_conversations(
+        self,
+        batch: List[Dict[str, Any]],
+        max_parallel: int = 16,
+        admit: Optional[Callable[[], AsyncContextManager]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Async version of start_conversations, never blocks the event loop
+        
+        Args:
+            batch: Items like {"question": ..., "thread_id": ...}; thread_id is optional
+            max_parallel: Upper bound on concurrently running graphs
+            admit: Optional factory of an async context manager entered around
+                each item's graph run, e.g. a server-wide concurrency slot; an
+                item it refuses gets status="error"
+            
+        Returns:
+            One result per item, in order, with per-item status
+            
+        Raises:
+            ValueError: Two items share a thread_id
+        """
+        self._check_thread_ids(batch)
+        semaphore = asyncio.Semaphore(max_parallel)
+        
+        async def run(item: Dict[str, Any]) -> Dict[str, Any]:
+            thread_id = item.get("thread_id") or f"thread-{uuid.uuid4()}"
+            async with semaphore:
+                try:
+                    async with admit() if admit is not None else nullcontext():
+                        return await self.astart_conversation(item["question"], thread_id)
+                except Exception as e:
+                    return {"status": "error", "message": str(e), "thread_id": thread_id}
+        
+        return await asyncio.gather(*(run(item) for item in batch))
+    
+    async def astream_conversation(
+        self,
+        question: str,
+        thread_id: str = "default"
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Start a conversation and report progress while the graph runs
+        
+        Args:
+            question: The user's question
+            thread_id: Unique identifier for this conversation thread
+            
+        Yields:
+            (event, data) pairs, as soon as each happens:
+            - ("node", {"node": ..., "update": ...}) after every node
+            - ("interrupt", {...}) when the agent needs clarification (last event)
+            - ("final", {...}) with the final answer (last event)
+        """
+        config = {"configurable": {"thread_id": thread_id}}
+        inputs = AgentState(question=question)
+        
+        values = {}
+        async for mode, chunk in self.graph.astream(
+            inputs,
+            config=config,
+            stream_mode=["updates", "values"]
+        ):
+            if mode == "values":
+                values = chunk
+                continue
+            
+            for node, update in chunk.items():
+                if node == "__interrupt__":
+                    yield "interrupt", {
+                        "status": "awaiting_clarification",
+                        "message": update[0].value["message"],
+                        "thread_id": thread_id
+                    }
+                    return
+                yield "node", {"node": node, "update": update}
+        
+        yield "final", {
             "status": "completed",
-            "final_answer": result.get("final_answer"),
-            "thread_id": thread_id,
-            "state": result
+            "final_answer": values.get("final_answer"),
+            "thread_id": thread_id
         }
+    
+    def close(self):
+        """Release the node thread pool and the checkpoint store"""
+        self.executor.shutdown(wait=False)
+        if hasattr(self.checkpointer, "close"):
+            self.checkpointer.close()
 
 
 # ===========================================================
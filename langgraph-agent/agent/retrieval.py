@@ -0,0 +1,609 @@
+"""
+retrieval.py - Local document retrieval for the Human-in-the-Loop Agent
+
+A folder of .txt / .md files is split into chunks and indexed twice:
+- BM25 over an inverted index (postings in CSR layout)
+- dense vectors, searched through an IVF coarse quantizer once the index is large
+
+Everything lives in one directory of .npy files that are memory-mapped when the
+index is opened, so start-up does not depend on the corpus size. New documents
+go to an in-memory delta that is searchable at once and merged into the files by
+`save()`; removed documents are masked until `compact()` rewrites the index.
+
+Build or refresh an index from the command line:
+    python retrieval.py sync ./docs --index ./index
+    python retrieval.py search "when was the eiffel tower built" --index ./index
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+import zlib
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+INDEX_VERSION = 2
+DOC_EXTENSIONS = (".txt", ".md")
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the "
+    "this to was were what when where which who why will with how do does did".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def coverage(query: str, text: str) -> float:
+    """Fraction of the query's distinct terms that occur in `text`, 0.0 for a query without terms"""
+    terms = set(tokenize(query))
+    if not terms:
+        return 0.0
+    return len(terms & set(tokenize(text))) / len(terms)
+
+
+def chunk_text(text: str, size: int = 200, overlap: int = 40) -> List[str]:
+    """Split text into chunks of about `size` words, consecutive chunks sharing `overlap` words"""
+    words = text.split()
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    step = max(1, size - overlap)
+    return [" ".join(words[start:start + size]) for start in range(0, len(words) - overlap, step)]
+
+
+# ===========================================================
+# Embeddings
+# ===========================================================
+class HashingEmbedder:
+    """
+    Dependency-free embedder: signed feature hashing of words and word pairs,
+    L2-normalized. Any callable mapping a list of texts to a float32
+    (n, dim) array can be used instead, e.g. a sentence-transformer model.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self._slots = {}
+
+    def _slot(self, feature: str) -> Tuple[int, float]:
+        """(bucket, sign) of a feature"""
+        slot = self._slots.get(feature)
+        if slot is None:
+            h = zlib.crc32(feature.encode("utf-8"))
+            # the top bit picks the sign, so collisions cancel out on average
+            slot = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+            if len(self._slots) < 1_000_000:
+                self._slots[feature] = slot
+        return slot
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        rows, buckets, signs = [], [], []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+            rows.extend([row] * len(features))
+            for feature in features:
+                bucket, sign = self._slot(feature)
+                buckets.append(bucket)
+                signs.append(sign)
+
+        flat = np.asarray(rows, dtype=np.int64) * self.dim + np.asarray(buckets, dtype=np.int64)
+        vectors = np.bincount(flat, weights=np.asarray(signs, dtype=np.float64), minlength=len(texts) * self.dim)
+        vectors = vectors.reshape(len(texts), self.dim).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+# ===========================================================
+# Index
+# ===========================================================
+class Hit(NamedTuple):
+    doc_id: str
+    chunk: int  # position of the chunk within its document
+    score: float
+    text: str
+    row: int  # row in the index, changes when compact() renumbers
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first"""
+    if len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _csr(keys: np.ndarray, n_keys: int, *columns: np.ndarray) -> tuple:
+    """Group columns by key: returns (offsets, column...) with each key's rows contiguous"""
+    order = np.argsort(keys, kind="stable")
+    offsets = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=offsets[1:])
+    return (offsets, ) + tuple(column[order] for column in columns)
+
+
+class RetrievalIndex:
+    """
+    Hybrid BM25 + dense retrieval index stored in `path`.
+
+    Example:
+        index = RetrievalIndex("./index")
+        index.sync_folder("./docs")        # add new / changed files, drop deleted ones
+        index.save()
+        for hit in index.search("eiffel tower height", k=5):
+            print(hit.doc_id, hit.score, hit.text[:80])
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedder: Optional[Callable] = None,
+        dim: int = 256,
+        k1: float = 1.2,
+        b: float = 0.75,
+        chunk_size: int = 200,
+        ivf_min_rows: int = 50_000,
+        nprobe: int = 8,
+        min_similarity: float = 0.1,
+        max_candidates: int = 8192,
+    ):
+        self.path = path
+        self.embedder = embedder or HashingEmbedder(dim)
+        self.k1 = k1
+        self.b = b
+        self.chunk_size = chunk_size
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self.min_similarity = min_similarity
+        self.max_candidates = max_candidates
+
+        self.vocab: Dict[str, int] = {}
+        self.docs: Dict[str, dict] = {}
+        self.doc_ids: List[str] = []
+        self.dim = dim
+        self._reset_base()
+        self._reset_delta()
+        if os.path.exists(os.path.join(path, "meta.json")):
+            self._load()
+
+    # -------------------------------------------------------
+    # Storage
+    # -------------------------------------------------------
+    def _reset_base(self):
+        self.n_base = 0
+        self._base_len = None
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.row_doc = np.zeros(0, dtype=np.int32)
+        self.deleted = np.zeros(0, dtype=bool)
+        self.text_offsets = np.zeros(1, dtype=np.int64)
+        self.texts = np.zeros(0, dtype=np.uint8)
+        self.post_offsets = np.zeros(1, dtype=np.int64)
+        self.post_rows = np.zeros(0, dtype=np.int32)
+        self.post_tf = np.zeros(0, dtype=np.float32)
+        self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self.centroids = None
+        self.ivf_trained_rows = 0
+        self.row_list = np.zeros(0, dtype=np.int32)
+        self.list_offsets = None
+        self.list_rows = None
+
+    def _reset_delta(self):
+        self.delta_texts: List[str] = []
+        self.delta_doc: List[int] = []
+        self.delta_len: List[int] = []
+        self.delta_terms: List[Counter] = []
+        self.delta_vectors: List[np.ndarray] = []
+        self.delta_deleted = set()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        with open(self._file("meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta["version"] != INDEX_VERSION:
+            raise ValueError(f"Index at {self.path} has version {meta['version']}, expected {INDEX_VERSION}")
+        with open(self._file("vocab.json"), "r") as f:
+            self.vocab = json.load(f)
+        self.docs = meta["docs"]
+        self.doc_ids = meta["doc_ids"]
+        self.dim = meta["dim"]
+        self.k1, self.b = meta["k1"], meta["b"]
+        self.n_base = meta["n_rows"]
+
+        def load(name):
+            return np.load(self._file(name + ".npy"), mmap_mode="r")
+
+        self.doc_len = load("doc_len")
+        self.row_doc = load("row_doc")
+        # the tombstone mask changes with every removal, keep a writable copy
+        self.deleted = np.array(load("deleted"))
+        self.text_offsets = load("text_offsets")
+        self.texts = load("texts")
+        self.post_offsets = load("post_offsets")
+        self.post_rows = load("post_rows")
+        self.post_tf = load("post_tf")
+        self.vectors = load("vectors")
+        self.row_list = load("row_list")
+        if meta["ivf"]:
+            self.ivf_trained_rows = meta["ivf_trained_rows"]
+            self.centroids = np.array(load("centroids"))
+            self.list_offsets = load("list_offsets")
+            self.list_rows = load("list_rows")
+
+    def save(self):
+        """Merge the in-memory delta into the on-disk files"""
+        if self.delta_texts or not os.path.exists(self._file("meta.json")):
+            self._merge_delta()
+        os.makedirs(self.path, exist_ok=True)
+        np.save(self._file("deleted.npy"), self.deleted)
+        meta = {
+            "version": INDEX_VERSION,
+            "dim": self.dim,
+            "k1": self.k1,
+            "b": self.b,
+            "n_rows": self.n_base,
+            "ivf": self.centroids is not None,
+            "ivf_trained_rows": self.ivf_trained_rows,
+            "docs": self.docs,
+            "doc_ids": self.doc_ids,
+        }
+        with open(self._file("vocab.json.tmp"), "w") as f:
+            json.dump(self.vocab, f)
+        with open(self._file("meta.json.tmp"), "w") as f:
+            json.dump(meta, f)
+        os.replace(self._file("vocab.json.tmp"), self._file("vocab.json"))
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+
+    def _write_arrays(self, arrays: Dict[str, np.ndarray]):
+        """Write the new arrays to a scratch directory first, then swap them in and re-map them"""
+        scratch = self._file("next")
+        os.makedirs(scratch, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(scratch, name + ".npy"), array)
+        # the old maps must be released before their files are replaced (Windows)
+        self._reset_base()
+        for name in arrays:
+            os.replace(os.path.join(scratch, name + ".npy"), self._file(name + ".npy"))
+        shutil.rmtree(scratch, ignore_errors=True)
+        for name in arrays:
+            setattr(self, name, np.load(self._file(name + ".npy"), mmap_mode="r"))
+
+    def _merge_delta(self):
+        n_new = len(self.delta_texts)
+        n_rows = self.n_base + n_new
+
+        new_rows, new_terms, new_tf = [], [], []
+        for offset, terms in enumerate(self.delta_terms):
+            new_rows.extend([self.n_base + offset] * len(terms))
+            new_terms.extend(terms.keys())
+            new_tf.extend(terms.values())
+
+        # postings: existing ones keep their term, new ones are appended, then regrouped by term
+        base_terms = np.repeat(
+            np.arange(len(self.post_offsets) - 1, dtype=np.int64), np.diff(np.asarray(self.post_offsets))
+        )
+        terms = np.concatenate([base_terms, np.asarray(new_terms, dtype=np.int64)])
+        rows = np.concatenate([np.asarray(self.post_rows), np.asarray(new_rows, dtype=np.int32)])
+        tf = np.concatenate([np.asarray(self.post_tf), np.asarray(new_tf, dtype=np.float32)])
+        post_offsets, post_rows, post_tf = _csr(terms, len(self.vocab), rows, tf)
+
+        encoded = [text.encode("utf-8") for text in self.delta_texts]
+        new_offsets = self.text_offsets[-1] + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+        vectors = np.concatenate([
+            np.asarray(self.vectors),
+            np.vstack(self.delta_vectors) if self.delta_vectors else np.zeros((0, self.dim), np.float32),
+        ])
+        deleted = np.concatenate([self.deleted, np.zeros(n_new, dtype=bool)])
+        for row in self.delta_deleted:
+            deleted[row] = True
+
+        arrays = {
+            "doc_len": np.concatenate([np.asarray(self.doc_len), np.asarray(self.delta_len, dtype=np.int32)]),
+            "row_doc": np.concatenate([np.asarray(self.row_doc), np.asarray(self.delta_doc, dtype=np.int32)]),
+            "text_offsets": np.concatenate([np.asarray(self.text_offsets), new_offsets]),
+            "texts": np.concatenate([np.asarray(self.texts), np.frombuffer(b"".join(encoded), dtype=np.uint8)]),
+            "post_offsets": post_offsets,
+            "post_rows": post_rows,
+            "post_tf": post_tf,
+            "vectors": vectors,
+        }
+        arrays.update(self._ivf_arrays(vectors))
+        centroids = arrays.get("centroids")
+        trained_rows = self.ivf_trained_rows
+
+        self._write_arrays(arrays)
+        self.deleted = deleted
+        self.ivf_trained_rows = trained_rows
+        self.centroids = None if centroids is None else np.array(centroids)
+        self.n_base = n_rows
+        self._reset_delta()
+
+    # -------------------------------------------------------
+    # Dense IVF
+    # -------------------------------------------------------
+    def _ivf_arrays(self, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        n = len(vectors)
+        if n < self.ivf_min_rows:
+            return {"row_list": np.zeros(n, dtype=np.int32)}
+        centroids = self.centroids
+        previous = len(self.row_list) if centroids is not None else 0
+        # new rows join the existing lists until the index has grown enough to
+        # unbalance them, then the lists are trained again on all rows
+        if centroids is None or n >= 4 * self.ivf_trained_rows:
+            centroids = self._train_centroids(vectors, n_lists=int(np.sqrt(n)))
+            self.ivf_trained_rows = n
+            previous = 0
+
+        row_list = np.empty(n, dtype=np.int32)
+        row_list[:previous] = self.row_list[:previous]
+        for start in range(previous, n, 65536):
+            block = vectors[start:start + 65536]
+            row_list[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        list_offsets, list_rows = _csr(row_list, len(centroids), np.arange(n, dtype=np.int32))
+        return {"row_list": row_list, "centroids": centroids, "list_offsets": list_offsets, "list_rows": list_rows}
+
+    @staticmethod
+    def _train_centroids(vectors: np.ndarray, n_lists: int, iterations: int = 8) -> np.ndarray:
+        """Spherical k-means on a sample of the vectors"""
+        rng = np.random.default_rng(0)
+        sample = np.asarray(vectors[rng.choice(len(vectors), size=min(len(vectors), n_lists * 64), replace=False)])
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        return centroids.astype(np.float32)
+
+    # -------------------------------------------------------
+    # Documents
+    # -------------------------------------------------------
+    def add_document(self, doc_id: str, text: str, mtime: float = None):
+        """Index a document (replacing an earlier version); searchable immediately, persisted by save()"""
+        if doc_id in self.docs:
+            self.remove_document(doc_id)
+        chunks = chunk_text(text, self.chunk_size, self.chunk_size // 5)
+        if chunks:
+            self._add_chunks(doc_id, chunks, mtime or time.time())
+
+    def remove_document(self, doc_id: str) -> bool:
+        """Hide a document from search; its rows are dropped for good by compact()"""
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return False
+        for row in range(doc["start"], doc["start"] + doc["count"]):
+            if row < self.n_base:
+                self.deleted[row] = True
+            else:
+                self.delta_deleted.add(row)
+        return True
+
+    def sync_folder(self, folder: str) -> Dict[str, int]:
+        """Add new and changed files from `folder`, remove documents whose file is gone"""
+        seen, added = set(), 0
+        for root, _, files in os.walk(folder):
+            for name in sorted(files):
+                if not name.lower().endswith(DOC_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                doc_id = os.path.relpath(path, folder).replace(os.sep, "/")
+                seen.add(doc_id)
+                mtime = os.path.getmtime(path)
+                if doc_id in self.docs and self.docs[doc_id]["mtime"] >= mtime:
+                    continue
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    self.add_document(doc_id, f.read(), mtime)
+                added += 1
+
+        removed = [doc_id for doc_id in self.docs if doc_id not in seen]
+        for doc_id in removed:
+            self.remove_document(doc_id)
+        return {"added": added, "removed": len(removed), "documents": len(self.docs)}
+
+    def compact(self):
+        """Rewrite the index without removed rows and retrain the IVF lists"""
+        self.save()
+        keep = np.flatnonzero(~self.deleted)
+        live_docs = sorted(self.docs.items(), key=lambda item: item[1]["start"])
+        texts = [self.text(row) for row in keep]
+
+        old = self.docs
+        self.docs, self.doc_ids, self.vocab = {}, [], {}
+        self._reset_base()
+        self._reset_delta()
+        # re-adding keeps each document's chunks contiguous and renumbers everything
+        row_text = dict(zip(keep.tolist(), texts))
+        for doc_id, doc in live_docs:
+            chunks = [row_text[row] for row in range(doc["start"], doc["start"] + doc["count"])]
+            self._add_chunks(doc_id, chunks, old[doc_id]["mtime"])
+        # always rewrite the arrays: with every document gone the delta is empty
+        # and save() alone would leave the old files next to an empty meta.json
+        self._merge_delta()
+        self.save()
+
+    def _add_chunks(self, doc_id: str, chunks: List[str], mtime: float):
+        doc_index = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        first_row = self.n_base + len(self.delta_texts)
+        for chunk in chunks:
+            tokens = tokenize(chunk)
+            self.delta_texts.append(chunk)
+            self.delta_doc.append(doc_index)
+            self.delta_len.append(len(tokens))
+            self.delta_terms.append(Counter(self.vocab.setdefault(token, len(self.vocab)) for token in tokens))
+        self.delta_vectors.append(np.asarray(self.embedder(chunks), dtype=np.float32))
+        self.docs[doc_id] = {"start": first_row, "count": len(chunks), "mtime": mtime}
+
+    # -------------------------------------------------------
+    # Search
+    # -------------------------------------------------------
+    @property
+    def n_rows(self) -> int:
+        return self.n_base + len(self.delta_texts)
+
+    def text(self, row: int) -> str:
+        if row >= self.n_base:
+            return self.delta_texts[row - self.n_base]
+        start, end = self.text_offsets[row], self.text_offsets[row + 1]
+        return bytes(self.texts[start:end]).decode("utf-8")
+
+    def _doc_of(self, row: int) -> str:
+        if row >= self.n_base:
+            return self.doc_ids[self.delta_doc[row - self.n_base]]
+        return self.doc_ids[self.row_doc[row]]
+
+    def _alive(self, rows: np.ndarray) -> np.ndarray:
+        """Mask of the rows that have not been removed"""
+        alive = np.ones(len(rows), dtype=bool)
+        base = rows < self.n_base
+        alive[base] = ~self.deleted[rows[base]]
+        if self.delta_deleted:
+            alive &= ~np.isin(rows, list(self.delta_deleted))
+        return alive
+
+    def bm25(self, query: str, k: int = 10) -> List[tuple]:
+        """Top-k (row, score) by BM25"""
+        term_ids = [self.vocab[token] for token in set(tokenize(query)) if token in self.vocab]
+        if not term_ids or self.n_rows == 0:
+            return []
+
+        n_live = max(1, self.n_rows - int(self.deleted.sum()) - len(self.delta_deleted))
+        lengths = self.delta_len
+        if self._base_len is None:
+            self._base_len = float(np.sum(self.doc_len, dtype=np.int64))
+        total_len = self._base_len + sum(lengths)
+        avgdl = max(total_len / max(self.n_rows, 1), 1.0)
+
+        rows, weights = [], []
+        for term in term_ids:
+            start, end = (self.post_offsets[term], self.post_offsets[term + 1]) if term + 1 < len(self.post_offsets) else (0, 0)
+            base_rows = np.asarray(self.post_rows[start:end])
+            base_tf = np.asarray(self.post_tf[start:end])
+            delta = [(self.n_base + i, terms[term]) for i, terms in enumerate(self.delta_terms) if term in terms]
+
+            df = len(base_rows) + len(delta)
+            idf = np.log(1 + (n_live - df + 0.5) / (df + 0.5))
+            term_rows = np.concatenate([base_rows, np.asarray([r for r, _ in delta], dtype=np.int32)])
+            tf = np.concatenate([base_tf, np.asarray([t for _, t in delta], dtype=np.float32)])
+            dl = np.concatenate([
+                np.asarray(self.doc_len)[base_rows],
+                np.asarray([lengths[r - self.n_base] for r, _ in delta], dtype=np.int32),
+            ]).astype(np.float32)
+            rows.append(term_rows)
+            weights.append(idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / avgdl)))
+
+        rows = np.concatenate(rows)
+        scores = np.bincount(rows, weights=np.concatenate(weights), minlength=self.n_rows)
+        # rank only the matching rows instead of all n_rows; a row is listed once
+        # per matching term, so the top k * terms entries hold k distinct rows
+        candidates = rows[self._alive(rows)]
+        top = candidates[_top_k(scores[candidates], k * len(term_ids))]
+        return [(row, float(scores[row])) for row in list(dict.fromkeys(top.tolist()))[:k]]
+
+    def dense(self, query: str, k: int = 10) -> List[tuple]:
+        """Top-k (row, score) by cosine similarity, ignoring rows below `min_similarity`"""
+        if self.n_rows == 0:
+            return []
+        q = np.asarray(self.embedder([query]), dtype=np.float32)[0]
+
+        if self.centroids is not None:
+            lists = _top_k(self.centroids @ q, self.nprobe)
+            # probe the nearest lists first and stop once the scan budget is used up
+            sizes = np.diff(np.asarray(self.list_offsets))[lists]
+            lists = lists[:max(1, int(np.searchsorted(np.cumsum(sizes), self.max_candidates, side="right")))]
+            candidates = np.concatenate([
+                np.asarray(self.list_rows[self.list_offsets[l]:self.list_offsets[l + 1]]) for l in lists
+            ])
+        else:
+            candidates = np.arange(self.n_base)
+        candidates = np.sort(candidates)
+        candidates = candidates[self._alive(candidates)]
+        scores = np.asarray(self.vectors[candidates]) @ q if len(candidates) else np.zeros(0, np.float32)
+
+        if self.delta_vectors:
+            delta_rows = np.arange(self.n_base, self.n_rows)
+            alive = self._alive(delta_rows)
+            candidates = np.concatenate([candidates, delta_rows[alive]])
+            scores = np.concatenate([scores, (np.vstack(self.delta_vectors) @ q)[alive]])
+
+        top = _top_k(scores, k)
+        return [(int(candidates[i]), float(scores[i])) for i in top if scores[i] >= self.min_similarity]
+
+    def search(self, query: str, k: int = 5, mode: str = "hybrid") -> List[Hit]:
+        """
+        Top-k chunks for a query
+
+        Args:
+            query: Free text
+            k: Number of chunks to return
+            mode: "bm25", "dense" or "hybrid" (reciprocal rank fusion of both)
+        """
+        if mode == "bm25":
+            ranked = self.bm25(query, k)
+        elif mode == "dense":
+            ranked = self.dense(query, k)
+        else:
+            fused = Counter()
+            for results in (self.bm25(query, k * 4), self.dense(query, k * 4)):
+                for rank, (row, _) in enumerate(results):
+                    fused[row] += 1.0 / (60 + rank)
+            ranked = fused.most_common(k)
+        hits = []
+        for row, score in ranked:
+            doc_id = self._doc_of(row)
+            hits.append(Hit(doc_id, row - self.docs[doc_id]["start"], score, self.text(row), row))
+        return hits
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self.docs),
+            "chunks": self.n_rows,
+            "deleted_chunks": int(self.deleted.sum()) + len(self.delta_deleted),
+            "unsaved_chunks": len(self.delta_texts),
+            "terms": len(self.vocab),
+            "ivf_lists": 0 if self.centroids is None else len(self.centroids),
+        }
+
+
+# ===========================================================
+# CLI
+# ===========================================================
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the agent's retrieval index")
+    parser.add_argument("--index", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "index"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    sync = commands.add_parser("sync", help="index new / changed files of a folder and drop removed ones")
+    sync.add_argument("folder")
+    commands.add_parser("compact", help="rewrite the index without removed documents")
+    search = commands.add_parser("search", help="print the top chunks for a query")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=5)
+    search.add_argument("--mode", choices=["hybrid", "bm25", "dense"], default="hybrid")
+    args = parser.parse_args()
+
+    index = RetrievalIndex(args.index)
+    if args.command == "sync":
+        print(index.sync_folder(args.folder))
+        index.save()
+    elif args.command == "compact":
+        index.compact()
+    else:
+        start = time.perf_counter()
+        hits = index.search(args.query, args.k, args.mode)
+        print(f"{len(hits)} hits in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for hit in hits:
+            print(f"{hit.score:8.4f}  {hit.doc_id}#{hit.chunk}  {hit.text[:100]}")
+    print(index.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+retrieval_test.py - Checks for the retrieval index
+
+Run with: python retrieval_test.py
+"""
+import tempfile
+
+from retrieval import RetrievalIndex
+
+
+def test_compact_after_removing_every_document():
+    """An emptied and compacted index must reopen and take new documents"""
+    path = tempfile.mkdtemp()
+    index = RetrievalIndex(path)
+    index.add_document("eiffel.txt", "The Eiffel Tower was built in 1889 in Paris.")
+    index.add_document("louvre.txt", "The Louvre is the most visited museum in Paris.")
+    index.save()
+
+    index.remove_document("eiffel.txt")
+    index.remove_document("louvre.txt")
+    index.compact()
+
+    index = RetrievalIndex(path)
+    assert index.stats()["chunks"] == 0
+    index.add_document("notre_dame.txt", "Notre-Dame is a medieval cathedral in Paris.")
+    index.save()
+
+    index = RetrievalIndex(path)
+    hits = index.search("medieval cathedral", k=1)
+    assert [hit.doc_id for hit in hits] == ["notre_dame.txt"], hits
+    print("✅ compact after removing every document")
+
+
+def test_compact_keeps_live_documents():
+    path = tempfile.mkdtemp()
+    index = RetrievalIndex(path)
+    index.add_document("eiffel.txt", "The Eiffel Tower was built in 1889 in Paris.")
+    index.add_document("louvre.txt", "The Louvre is the most visited museum in Paris.")
+    index.save()
+
+    index.remove_document("eiffel.txt")
+    index.compact()
+
+    index = RetrievalIndex(path)
+    assert index.stats()["chunks"] == 1
+    assert [hit.doc_id for hit in index.search("museum", k=1)] == ["louvre.txt"]
+    assert index.search("eiffel tower", k=1, mode="bm25") == []
+    print("✅ compact keeps live documents")
+
+
+if __name__ == "__main__":
+    test_compact_after_removing_every_document()
+    test_compact_keeps_live_documents()